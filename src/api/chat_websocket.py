@@ -0,0 +1,228 @@
+import asyncio
+import logging
+import time
+from typing import Dict
+
+from fastapi import WebSocket, WebSocketDisconnect, status
+from pydantic import ValidationError
+
+from src.api.schemas import ChatRequest, ChatResponse
+from src.application.services.chat_service import ChatProcessingError, ChatService
+from src.application.services.generation_config_resolver import (
+    GenerationConfigResolver,
+    InvalidGenerationConfigError,
+)
+from src.application.services.prompt_pipeline import PromptTooLargeError
+from src.application.services.prompt_template_registry import PromptTemplateRegistry, TemplateNotFoundError
+
+logger = logging.getLogger(__name__)
+
+
+class ChatTurnRequest(ChatRequest):
+    requestId: str
+
+
+class SlowConsumerError(Exception):
+    """Exception raised when the client does not drain its send queue in time."""
+    pass
+
+
+class ChatWebSocketSession():
+    """
+    Multiplexes chat turns over a single WebSocket connection.
+
+    Client messages:
+        {"type": "chat", "requestId": "...", "userId": "...", "prompt": "...", ...ChatRequest fields}
+        {"type": "ping"} / {"type": "pong"}
+
+    Server messages:
+        {"type": "token", "requestId": "...", "text": "..."}
+        {"type": "done", "requestId": "...", "response": {...ChatResponse}}
+        {"type": "error", "requestId": "...", "detail": "..."}
+        {"type": "ping"} / {"type": "pong"}
+
+    Outgoing messages go through a bounded queue drained by a single writer. Turns
+    wait for room in the queue, which pauses their token stream when the client reads
+    slowly; a client that does not drain the queue within the send timeout, or that
+    stays silent past the heartbeat timeout, is disconnected.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        chat_service: ChatService,
+        config_resolver: GenerationConfigResolver,
+        template_registry: PromptTemplateRegistry,
+        send_queue_size: int = 64,
+        send_timeout_seconds: float = 30.0,
+        max_concurrent_turns: int = 4,
+        heartbeat_interval_seconds: float = 20.0,
+        heartbeat_timeout_seconds: float = 60.0
+    ):
+        self.websocket = websocket
+        self.chat_service = chat_service
+        self.config_resolver = config_resolver
+        self.template_registry = template_registry
+        self.send_timeout_seconds = send_timeout_seconds
+        self.max_concurrent_turns = max_concurrent_turns
+        self.heartbeat_interval_seconds = heartbeat_interval_seconds
+        self.heartbeat_timeout_seconds = heartbeat_timeout_seconds
+
+        self._send_queue: asyncio.Queue = asyncio.Queue(maxsize=send_queue_size)
+        self._turns: Dict[str, asyncio.Task] = {}
+        self._close_code = status.WS_1000_NORMAL_CLOSURE
+        self._closing = asyncio.Event()
+        self._last_seen = time.monotonic()
+
+    async def run(self):
+        """
+        Serves the connection until the client disconnects or is dropped.
+        """
+        await self.websocket.accept()
+        tasks = [
+            asyncio.create_task(self._read()),
+            asyncio.create_task(self._write()),
+            asyncio.create_task(self._heartbeat()),
+            asyncio.create_task(self._closing.wait()),
+        ]
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            pending = [*tasks, *self._turns.values()]
+            for task in pending:
+                task.cancel()
+            # asyncio.wait, unlike gather, keeps the caller's own cancellation intact
+            await asyncio.wait(pending)
+            await self._close()
+
+    async def _read(self):
+        try:
+            await self._read_messages()
+        except SlowConsumerError:
+            return
+
+    async def _read_messages(self):
+        while True:
+            try:
+                message = await self.websocket.receive_json()
+            except WebSocketDisconnect:
+                logger.info("WebSocket client disconnected.")
+                return
+            except (ValueError, KeyError):
+                # KeyError: binary frames carry no text payload
+                self._send_nowait({"type": "error", "detail": "Messages must be JSON objects sent as text frames."})
+                continue
+
+            self._last_seen = time.monotonic()
+            message_type = message.get("type") if isinstance(message, dict) else None
+
+            if message_type == "ping":
+                await self._send({"type": "pong"})
+            elif message_type == "pong":
+                continue
+            elif message_type == "chat":
+                await self._start_turn(message)
+            else:
+                await self._send({"type": "error", "detail": f"Unsupported message type: {message_type}"})
+
+    async def _start_turn(self, message: dict):
+        try:
+            turn_request = ChatTurnRequest.model_validate(message)
+        except ValidationError as e:
+            await self._send({"type": "error", "requestId": message.get("requestId"), "detail": e.errors(include_url=False)})
+            return
+
+        request_id = turn_request.requestId
+        if request_id in self._turns:
+            await self._send({"type": "error", "requestId": request_id, "detail": "requestId is already in flight."})
+            return
+        if len(self._turns) >= self.max_concurrent_turns:
+            await self._send({"type": "error", "requestId": request_id, "detail": "Too many chat turns in flight."})
+            return
+
+        task = asyncio.create_task(self._run_turn(turn_request))
+        self._turns[request_id] = task
+        task.add_done_callback(lambda _: self._turns.pop(request_id, None))
+
+    async def _run_turn(self, turn_request: ChatTurnRequest):
+        try:
+            await self._serve_turn(turn_request)
+        except SlowConsumerError:
+            return
+
+    async def _serve_turn(self, turn_request: ChatTurnRequest):
+        request_id = turn_request.requestId
+        try:
+            config, template = turn_request.resolve_options(self.config_resolver, self.template_registry)
+        except (InvalidGenerationConfigError, TemplateNotFoundError) as e:
+            await self._send({"type": "error", "requestId": request_id, "detail": str(e)})
+            return
+
+        async def on_token(text: str):
+            await self._send({"type": "token", "requestId": request_id, "text": text})
+
+        try:
+            chat_interaction = await self.chat_service.chat_stream(
+                turn_request.prompt,
+                on_token,
+                turn_request.userId,
+                config,
+                template
+            )
+            response = ChatResponse.from_interaction(chat_interaction, turn_request.prompt)
+            await self._send({"type": "done", "requestId": request_id, "response": response.model_dump()})
+        except PromptTooLargeError as e:
+            await self._send({"type": "error", "requestId": request_id, "detail": str(e)})
+        except ChatProcessingError as e:
+            logger.error(f"WebSocket Error: Chat processing failed for user {turn_request.userId}. Details: {e}")
+            await self._send({
+                "type": "error",
+                "requestId": request_id,
+                "detail": "An unexpected error happening while processing the chat request."
+            })
+
+    async def _write(self):
+        while True:
+            message = await self._send_queue.get()
+            try:
+                await self.websocket.send_json(message)
+            except (WebSocketDisconnect, RuntimeError):
+                logger.info("WebSocket client went away while sending.")
+                return
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval_seconds)
+            if time.monotonic() - self._last_seen > self.heartbeat_timeout_seconds:
+                logger.info("WebSocket client missed its heartbeat, closing the connection.")
+                self._close_code = status.WS_1001_GOING_AWAY
+                return
+            self._send_nowait({"type": "ping"})
+
+    async def _send(self, message: dict):
+        """
+        Queues a message, waiting for room; drops the connection if the client does not catch up.
+        """
+        try:
+            await asyncio.wait_for(self._send_queue.put(message), timeout=self.send_timeout_seconds)
+        except asyncio.TimeoutError:
+            logger.warning("WebSocket client is not consuming messages, closing the connection.")
+            self._close_code = status.WS_1008_POLICY_VIOLATION
+            self._closing.set()
+            raise SlowConsumerError()
+
+    def _send_nowait(self, message: dict):
+        """
+        Queues a control message if there is room; a full queue already has data pending for the client.
+        """
+        try:
+            self._send_queue.put_nowait(message)
+        except asyncio.QueueFull:
+            pass
+
+    async def _close(self):
+        try:
+            await self.websocket.close(code=self._close_code)
+        except RuntimeError:
+            # The connection is already closed
+            pass
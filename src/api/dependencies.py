@@ -1,32 +1,96 @@
 ## Dependency Injection Functions
+from functools import lru_cache
 from fastapi import Depends
+from google import genai
 from pymongo.database import Database
 
 from src.domain.repositories.chat_repository import ChatRepository
 from src.domain.clients.llm_client import LLMClient
 from src.application.services.chat_service import ChatService
+from src.application.services.generation_config_resolver import GenerationConfigResolver
+from src.application.services.generation_metrics import GenerationMetrics
+from src.application.services.prompt_pipeline import PromptPipeline, build_default_pipeline
+from src.application.services.prompt_template_registry import PromptTemplateRegistry
 
 from src.infrastructure.clients.gemini_client import GeminiClient 
+from src.infrastructure.clients.gemini_context_cache import GeminiContextCache
 from src.infrastructure.persistence.db_chat_repository import DatabaseChatRepository 
 from src.infrastructure.persistence.database import get_database
+from src.shared.settings import get_settings
 
+@lru_cache
 def get_llm_client_dependency() -> LLMClient:
     """
     Dependency to get a concrete instance of LLMClient.
+    The instance is shared so provider-side context caches outlive a single request.
     """
-    return GeminiClient()
+    settings = get_settings()
+    genai_client = genai.Client()
+    context_cache = GeminiContextCache(
+        genai_client,
+        ttl_seconds=settings.context_cache_ttl_seconds,
+        refresh_margin_seconds=settings.context_cache_refresh_margin_seconds
+    )
+    return GeminiClient(genai_client=genai_client, context_cache=context_cache)
+
+@lru_cache
+def get_generation_config_resolver_dependency() -> GenerationConfigResolver:
+    """
+    Dependency to get the shared GenerationConfigResolver built from the configured model tiers.
+    """
+    settings = get_settings()
+    return GenerationConfigResolver(tiers=settings.model_tiers, default_tier=settings.default_model_tier)
+
+@lru_cache
+def get_prompt_template_registry_dependency() -> PromptTemplateRegistry:
+    """
+    Dependency to get the shared PromptTemplateRegistry built from the configured templates.
+    """
+    return PromptTemplateRegistry(templates=get_settings().prompt_templates)
 
 def get_chat_repository_dependency(database: Database = Depends(get_database)) -> ChatRepository:
     """
     Dependency to get a concrete instance of ChatRepository.
     """
-    return DatabaseChatRepository(database=database)
+    settings = get_settings()
+    return DatabaseChatRepository(
+        database=database,
+        deduplicate=settings.storage_mode == "deduplicated",
+        compression=settings.blob_compression
+    )
+
+@lru_cache
+def get_generation_metrics_dependency() -> GenerationMetrics:
+    """
+    Dependency to get the process-wide GenerationMetrics counters.
+    """
+    return GenerationMetrics()
+
+@lru_cache
+def get_prompt_pipeline_dependency() -> PromptPipeline:
+    """
+    Dependency to get the shared prompt preprocessing pipeline, so its token estimate cache is reused.
+    """
+    settings = get_settings()
+    return build_default_pipeline(
+        soft_limit=settings.prompt_soft_token_limit,
+        hard_limit=settings.prompt_hard_token_limit,
+        estimate_cache_size=settings.token_estimate_cache_size
+    )
 
 def get_chat_service_dependency(
     llm_client: LLMClient = Depends(get_llm_client_dependency),
-    chat_repository: ChatRepository = Depends(get_chat_repository_dependency)
+    chat_repository: ChatRepository = Depends(get_chat_repository_dependency),
+    metrics: GenerationMetrics = Depends(get_generation_metrics_dependency),
+    preprocessor: PromptPipeline = Depends(get_prompt_pipeline_dependency)
 ) -> ChatService:
     """
     Dependency to get an instance of ChatService, injecting its required dependencies.
     """
-    return ChatService(llm_client=llm_client, chat_repository=chat_repository)
\ No newline at end of file
+    return ChatService(
+        llm_client=llm_client,
+        chat_repository=chat_repository,
+        metrics=metrics,
+        cancellation_policy=get_settings().cancelled_interaction_policy,
+        preprocessor=preprocessor
+    )
\ No newline at end of file
@@ -1,54 +1,136 @@
+import asyncio
 import logging
-from fastapi import APIRouter, Depends, HTTPException, status
-from pydantic import BaseModel
+from typing import Awaitable, TypeVar
+from fastapi import APIRouter, Depends, HTTPException, Request, WebSocket, status
 
 from src.application.services.chat_service import ChatService
-from src.api.dependencies import get_chat_service_dependency
+from src.api.chat_websocket import ChatWebSocketSession
+from src.api.dependencies import (
+    get_chat_service_dependency,
+    get_generation_config_resolver_dependency,
+    get_generation_metrics_dependency,
+    get_prompt_template_registry_dependency,
+)
+from src.api.schemas import ChatRequest, ChatResponse
 from src.application.services.chat_service import ChatProcessingError
+from src.application.services.generation_config_resolver import (
+    GenerationConfigResolver,
+    InvalidGenerationConfigError,
+)
+from src.application.services.generation_metrics import GenerationMetrics
+from src.application.services.prompt_pipeline import PromptTooLargeError
+from src.application.services.prompt_template_registry import PromptTemplateRegistry, TemplateNotFoundError
+from src.shared.settings import Settings, get_settings
 
 logger = logging.getLogger(__name__)
 api_router = APIRouter()
 
+# Non-standard status (as used by nginx) for requests the client abandoned
+HTTP_499_CLIENT_CLOSED_REQUEST = 499
 
-class ChatRequest(BaseModel):
-    userId: str
-    prompt: str
+T = TypeVar("T")
 
-class ChatResponse(BaseModel):
-    id: str
-    userId: str
-    prompt: str
-    response: str
-    model: str
-    timestamp: str
+
+class ClientDisconnectedError(Exception):
+    """Exception raised when the client goes away before its request completes."""
+    pass
+
+
+async def run_until_disconnected(request: Request, awaitable: Awaitable[T], poll_interval_seconds: float) -> T:
+    """
+    Awaits the given work while polling the client connection, cancelling the work
+    and raising ClientDisconnectedError as soon as the client disconnects.
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval_seconds)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                break
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
+
+    task.cancel()
+    await asyncio.wait({task})
+    if not task.cancelled() and task.exception() is None:
+        # The work finished before the cancellation took effect
+        return task.result()
+    raise ClientDisconnectedError()
 
 
 ## API Endpoints
 @api_router.post("/v1/chat", response_model=ChatResponse)
 async def chat(
     chat_request: ChatRequest,
-    chat_service: ChatService = Depends(get_chat_service_dependency)
+    request: Request,
+    chat_service: ChatService = Depends(get_chat_service_dependency),
+    config_resolver: GenerationConfigResolver = Depends(get_generation_config_resolver_dependency),
+    template_registry: PromptTemplateRegistry = Depends(get_prompt_template_registry_dependency),
+    settings: Settings = Depends(get_settings)
 ):
     """
     Handles chat requests, processes them using the ChatService, and returns a ChatResponse.
+    The generation is cancelled if the client disconnects before it completes.
     """
+    try:
+        config, template = chat_request.resolve_options(config_resolver, template_registry)
+    except (InvalidGenerationConfigError, TemplateNotFoundError) as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)) from e
+
     try:
         # Call the application service's chat method
-        chat_interaction = await chat_service.chat(chat_request.prompt, chat_request.userId)
+        chat_interaction = await run_until_disconnected(
+            request,
+            chat_service.chat(chat_request.prompt, chat_request.userId, config, template),
+            settings.disconnect_poll_interval_seconds
+        )
 
         # Construct the response model
-        chat_response = ChatResponse(
-            id=chat_interaction.id,
-            userId=chat_interaction.userId,
-            prompt=chat_request.prompt,
-            response=chat_interaction.response,
-            model=chat_interaction.model,
-            timestamp=chat_interaction.timestamp.isoformat()
-        )
-        return chat_response
+        return ChatResponse.from_interaction(chat_interaction, chat_request.prompt)
+    except PromptTooLargeError as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e)) from e
     except ChatProcessingError as e:
         logger.error(f"API Error: Chat processing failed for user {chat_request.userId}. Details: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="An unexpected error happening while processing the chat request."
         ) from e
+    except ClientDisconnectedError as e:
+        logger.info(f"Client disconnected, chat request cancelled for user {chat_request.userId}.")
+        raise HTTPException(status_code=HTTP_499_CLIENT_CLOSED_REQUEST, detail="Client closed request.") from e
+
+
+@api_router.get("/v1/metrics/generation")
+async def generation_metrics(metrics: GenerationMetrics = Depends(get_generation_metrics_dependency)):
+    """
+    Returns counters of completed and cancelled generations and the time wasted and saved by cancelling.
+    """
+    return metrics.snapshot()
+
+
+@api_router.websocket("/v1/chat/ws")
+async def chat_websocket(
+    websocket: WebSocket,
+    chat_service: ChatService = Depends(get_chat_service_dependency),
+    config_resolver: GenerationConfigResolver = Depends(get_generation_config_resolver_dependency),
+    template_registry: PromptTemplateRegistry = Depends(get_prompt_template_registry_dependency),
+    settings: Settings = Depends(get_settings)
+):
+    """
+    Persistent chat channel. Dependencies are resolved once and shared by every turn on the connection.
+    """
+    session = ChatWebSocketSession(
+        websocket=websocket,
+        chat_service=chat_service,
+        config_resolver=config_resolver,
+        template_registry=template_registry,
+        send_queue_size=settings.ws_send_queue_size,
+        send_timeout_seconds=settings.ws_send_timeout_seconds,
+        max_concurrent_turns=settings.ws_max_concurrent_turns,
+        heartbeat_interval_seconds=settings.ws_heartbeat_interval_seconds,
+        heartbeat_timeout_seconds=settings.ws_heartbeat_timeout_seconds
+    )
+    await session.run()
@@ -0,0 +1,59 @@
+from typing import Optional, Tuple
+from pydantic import BaseModel, Field
+
+from src.application.services.generation_config_resolver import GenerationConfigResolver
+from src.application.services.prompt_template_registry import PromptTemplateRegistry
+from src.domain.entities.chat_interaction import ChatInteraction
+from src.domain.entities.generation_config import GenerationConfig
+from src.domain.entities.prompt_template import PromptTemplate
+
+
+class ChatRequest(BaseModel):
+    userId: str
+    prompt: str
+    tier: Optional[str] = None
+    model: Optional[str] = None
+    maxOutputTokens: Optional[int] = Field(default=None, gt=0)
+    temperature: Optional[float] = Field(default=None, ge=0.0, le=2.0)
+    topP: Optional[float] = Field(default=None, ge=0.0, le=1.0)
+    topK: Optional[int] = Field(default=None, gt=0)
+    templateId: Optional[str] = None
+
+    def resolve_options(
+        self,
+        config_resolver: GenerationConfigResolver,
+        template_registry: PromptTemplateRegistry
+    ) -> Tuple[GenerationConfig, Optional[PromptTemplate]]:
+        """
+        Resolves the requested generation config and template, raising
+        InvalidGenerationConfigError or TemplateNotFoundError when they are not allowed.
+        """
+        config = config_resolver.resolve(
+            tier=self.tier,
+            model=self.model,
+            max_output_tokens=self.maxOutputTokens,
+            temperature=self.temperature,
+            top_p=self.topP,
+            top_k=self.topK
+        )
+        template = template_registry.get(self.templateId) if self.templateId else None
+        return config, template
+
+class ChatResponse(BaseModel):
+    id: str
+    userId: str
+    prompt: str
+    response: str
+    model: str
+    timestamp: str
+
+    @classmethod
+    def from_interaction(cls, chat_interaction: ChatInteraction, prompt: str) -> "ChatResponse":
+        return cls(
+            id=chat_interaction.id,
+            userId=chat_interaction.userId,
+            prompt=prompt,
+            response=chat_interaction.response,
+            model=chat_interaction.model,
+            timestamp=chat_interaction.timestamp.isoformat()
+        )
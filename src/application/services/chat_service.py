@@ -1,9 +1,17 @@
+import asyncio
 import logging
+import time
 
+from contextlib import contextmanager
 from datetime import datetime
+from typing import Awaitable, Callable, Optional
+from src.application.services.generation_metrics import GenerationMetrics
+from src.application.services.prompt_pipeline import PromptPipeline, PromptTooLargeError
 from src.domain.clients.llm_client import LLMClient, LLMGenerationError
 from src.domain.repositories.chat_repository import ChatRepository, ChatSaveError
 from src.domain.entities.chat_interaction import ChatInteraction
+from src.domain.entities.generation_config import GenerationConfig
+from src.domain.entities.prompt_template import PromptTemplate
 
 logger = logging.getLogger(__name__)
 
@@ -14,26 +22,176 @@ class ChatProcessingError(Exception):
 
 
 class ChatService():
-    def __init__(self, llm_client: LLMClient, chat_repository: ChatRepository):
+    def __init__(
+        self,
+        llm_client: LLMClient,
+        chat_repository: ChatRepository,
+        metrics: Optional[GenerationMetrics] = None,
+        cancellation_policy: str = "record",
+        preprocessor: Optional[PromptPipeline] = None
+    ):
         self.llm_client = llm_client
         self.chat_repository = chat_repository
+        self.preprocessor = preprocessor
+        self.metrics = metrics if metrics is not None else GenerationMetrics()
+        self.cancellation_policy = cancellation_policy
 
-    async def chat(self, prompt, user_id: str = None):
-        try:
+    async def chat(
+        self,
+        prompt,
+        user_id: str = None,
+        config: Optional[GenerationConfig] = None,
+        template: Optional[PromptTemplate] = None
+    ):
+        with self._handle_errors(user_id):
             logger.info(f"Processing new chat interaction")
-            answer = self.llm_client.generate_text(prompt)
-
-            chat_interaction = ChatInteraction(
-                userId=user_id,
-                prompt=prompt,
-                response=answer,
-                model=self.llm_client.get_model_name(),
-                timestamp=datetime.now()
+            prompt, estimated_tokens = self._preprocess(prompt, template)
+            started = time.monotonic()
+            try:
+                answer = await self.llm_client.generate_text(prompt, config, template)
+            except asyncio.CancelledError:
+                await self._handle_cancellation(prompt, "", started, user_id, config, template, estimated_tokens)
+                raise
+            self.metrics.record_completed(time.monotonic() - started)
+            return await self._save_interaction(
+                prompt, answer.text, user_id, config, template, estimated_tokens, answer.promptTokens
             )
-            chat_interaction.id = await self.chat_repository.create_chat_interaction(
-                chat_interaction
+
+    async def chat_stream(
+        self,
+        prompt,
+        on_token: Callable[[str], Awaitable[None]],
+        user_id: str = None,
+        config: Optional[GenerationConfig] = None,
+        template: Optional[PromptTemplate] = None
+    ):
+        """
+        Streams the response through on_token as it is generated, then saves and returns the interaction.
+        Awaiting on_token lets slow consumers apply backpressure to the generation.
+
+        If on_token raises, the consumer is gone: the generation is stopped and handled as a
+        cancellation, and the consumer's exception is re-raised unchanged.
+        """
+        consumer_error = None
+        with self._handle_errors(user_id):
+            logger.info("Processing new streamed chat interaction")
+            prompt, estimated_tokens = self._preprocess(prompt, template)
+            started = time.monotonic()
+            chunks = []
+            prompt_tokens = None
+            stream = self.llm_client.stream_text(prompt, config, template)
+            try:
+                async for chunk in stream:
+                    if chunk.promptTokens is not None:
+                        prompt_tokens = chunk.promptTokens
+                    if not chunk.text:
+                        continue
+                    chunks.append(chunk.text)
+                    try:
+                        await on_token(chunk.text)
+                    except Exception as e:
+                        consumer_error = e
+                        break
+            except asyncio.CancelledError:
+                await self._handle_cancellation(
+                    prompt, "".join(chunks), started, user_id, config, template, estimated_tokens, prompt_tokens
+                )
+                raise
+
+            if consumer_error is None:
+                self.metrics.record_completed(time.monotonic() - started)
+                return await self._save_interaction(
+                    prompt, "".join(chunks), user_id, config, template, estimated_tokens, prompt_tokens
+                )
+
+            logger.info(f"Stream consumer for user {user_id} failed, stopping the generation: {consumer_error!r}")
+            await stream.aclose()
+            await self._handle_cancellation(
+                prompt, "".join(chunks), started, user_id, config, template, estimated_tokens, prompt_tokens
             )
-            return chat_interaction
+        # Raised outside _handle_errors so the caller sees its own exception, not a ChatProcessingError
+        raise consumer_error
+
+    def _preprocess(self, prompt, template: Optional[PromptTemplate]):
+        """
+        Runs the preprocessing pipeline, returning the prompt to send and its estimated token count.
+        Raises PromptTooLargeError before any upstream call when the prompt is over the hard limit.
+        """
+        if self.preprocessor is None:
+            return prompt, None
+        context = self.preprocessor.run(prompt, template)
+        return context.prompt, context.estimatedTokens
+
+    async def _handle_cancellation(
+        self,
+        prompt,
+        partial_answer: str,
+        started: float,
+        user_id: str,
+        config: Optional[GenerationConfig],
+        template: Optional[PromptTemplate],
+        estimated_tokens: Optional[int] = None,
+        prompt_tokens: Optional[int] = None
+    ):
+        """
+        Accounts for a generation abandoned by the client and, depending on the policy,
+        records it with a cancelled status.
+        """
+        elapsed = time.monotonic() - started
+        saved = self.metrics.record_cancelled(elapsed)
+        logger.info(
+            f"Chat generation cancelled for user {user_id} after {elapsed:.2f}s "
+            f"(estimated {saved:.2f}s of generation saved)"
+        )
+        if self.cancellation_policy != "record":
+            return
+
+        try:
+            # Shielded so a repeated cancellation cannot interrupt the write halfway
+            await asyncio.shield(
+                self._save_interaction(
+                    prompt, partial_answer, user_id, config, template, estimated_tokens, prompt_tokens,
+                    status="cancelled"
+                )
+            )
+        except ChatSaveError as e:
+            logger.error(f"Failed to save cancelled chat interaction for user {user_id}: {e}")
+
+    async def _save_interaction(
+        self,
+        prompt,
+        answer: str,
+        user_id: str,
+        config: Optional[GenerationConfig],
+        template: Optional[PromptTemplate],
+        estimated_tokens: Optional[int] = None,
+        prompt_tokens: Optional[int] = None,
+        status: str = "completed"
+    ) -> ChatInteraction:
+        chat_interaction = ChatInteraction(
+            userId=user_id,
+            prompt=prompt,
+            response=answer,
+            model=config.model if config is not None else self.llm_client.get_model_name(),
+            timestamp=datetime.now(),
+            generationConfig=config,
+            templateId=template.id if template is not None else None,
+            estimatedTokens=estimated_tokens,
+            promptTokens=prompt_tokens,
+            status=status
+        )
+        chat_interaction.id = await self.chat_repository.create_chat_interaction(
+            chat_interaction
+        )
+        return chat_interaction
+
+    @contextmanager
+    def _handle_errors(self, user_id: str):
+        try:
+            yield
+        except PromptTooLargeError:
+            logger.warning(f"Rejected oversized prompt for user {user_id}")
+            raise
         except LLMGenerationError as e:
             logger.error(f"LLM generation failed for user {user_id}: {e}")
             raise ChatProcessingError(f"Failed to generate response due to LLM error.")
@@ -43,4 +201,3 @@ class ChatService():
         except Exception as e:
             logger.error(f"An unexpected error occurred during chat processing for user {user_id}: {e}")
             raise ChatProcessingError(f"An unexpected error occurred during chat processing: {e}") from e
-
@@ -0,0 +1,91 @@
+import logging
+from typing import Dict, Optional
+
+from src.domain.entities.generation_config import GenerationConfig
+from src.shared.settings import ModelTier
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidGenerationConfigError(Exception):
+    """Exception raised when requested generation parameters are not allowed by any tier."""
+    pass
+
+
+class GenerationConfigResolver():
+    """
+    Validates requested generation parameters against the configured model tiers
+    and resolves them into a GenerationConfig.
+    """
+
+    def __init__(self, tiers: Dict[str, ModelTier], default_tier: str):
+        if default_tier not in tiers:
+            raise ValueError(f"Default model tier '{default_tier}' is not configured.")
+
+        self.tiers = tiers
+        self.default_tier = default_tier
+        # One reusable config object per tier, shared by every request that does not override it
+        self._tier_configs = {
+            name: GenerationConfig(
+                tier=name,
+                model=tier.models[0],
+                maxOutputTokens=tier.max_output_tokens,
+                temperature=tier.temperature,
+            )
+            for name, tier in tiers.items()
+        }
+
+    def resolve(
+        self,
+        tier: Optional[str] = None,
+        model: Optional[str] = None,
+        max_output_tokens: Optional[int] = None,
+        temperature: Optional[float] = None,
+        top_p: Optional[float] = None,
+        top_k: Optional[int] = None,
+    ) -> GenerationConfig:
+        """
+        Returns the effective config for the request, raising InvalidGenerationConfigError
+        when the tier, model, output cap or sampling parameters are not allowed.
+        """
+        tier_name = tier or self._tier_for_model(model) or self.default_tier
+        if tier_name not in self.tiers:
+            raise InvalidGenerationConfigError(f"Unknown model tier '{tier_name}'.")
+
+        model_tier = self.tiers[tier_name]
+        if model is not None and model not in model_tier.models:
+            raise InvalidGenerationConfigError(f"Model '{model}' is not allowed in tier '{tier_name}'.")
+        if max_output_tokens is not None and max_output_tokens > model_tier.max_output_tokens:
+            raise InvalidGenerationConfigError(
+                f"maxOutputTokens must not exceed {model_tier.max_output_tokens} in tier '{tier_name}'."
+            )
+        bounds = [
+            ("temperature", temperature, model_tier.max_temperature),
+            ("topP", top_p, model_tier.max_top_p),
+            ("topK", top_k, model_tier.max_top_k),
+        ]
+        for field, value, limit in bounds:
+            if value is not None and limit is not None and value > limit:
+                raise InvalidGenerationConfigError(f"{field} must not exceed {limit} in tier '{tier_name}'.")
+
+        overrides = {
+            "model": model,
+            "maxOutputTokens": max_output_tokens,
+            "temperature": temperature,
+            "topP": top_p,
+            "topK": top_k,
+        }
+        overrides = {key: value for key, value in overrides.items() if value is not None}
+
+        config = self._tier_configs[tier_name]
+        if overrides:
+            config = config.model_copy(update=overrides)
+        return config
+
+    def _tier_for_model(self, model: Optional[str]) -> Optional[str]:
+        if model is None:
+            return None
+        for name, tier in self.tiers.items():
+            if model in tier.models:
+                return name
+        raise InvalidGenerationConfigError(f"Model '{model}' is not allowed in any tier.")
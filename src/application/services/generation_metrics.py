@@ -0,0 +1,45 @@
+from typing import Dict
+
+
+class GenerationMetrics():
+    """
+    In-process counters comparing generation time spent on cancelled requests (wasted)
+    with the generation time their cancellation avoided (saved).
+
+    Saved time is estimated as the average duration of completed generations minus
+    the time the cancelled generation had already run.
+    """
+
+    def __init__(self):
+        self.completed_count = 0
+        self.cancelled_count = 0
+        self.completed_seconds = 0.0
+        self.wasted_seconds = 0.0
+        self.saved_seconds = 0.0
+
+    def record_completed(self, duration_seconds: float) -> None:
+        self.completed_count += 1
+        self.completed_seconds += duration_seconds
+
+    def record_cancelled(self, elapsed_seconds: float) -> float:
+        """
+        Records a cancelled generation and returns the estimated generation time it saved.
+        """
+        saved_seconds = 0.0
+        if self.completed_count:
+            average_seconds = self.completed_seconds / self.completed_count
+            saved_seconds = max(average_seconds - elapsed_seconds, 0.0)
+
+        self.cancelled_count += 1
+        self.wasted_seconds += elapsed_seconds
+        self.saved_seconds += saved_seconds
+        return saved_seconds
+
+    def snapshot(self) -> Dict[str, float]:
+        return {
+            "completedCount": self.completed_count,
+            "cancelledCount": self.cancelled_count,
+            "completedSeconds": self.completed_seconds,
+            "wastedSeconds": self.wasted_seconds,
+            "savedSeconds": self.saved_seconds,
+        }
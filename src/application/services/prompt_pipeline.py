@@ -0,0 +1,201 @@
+import hashlib
+import logging
+import math
+import re
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from src.domain.entities.prompt_template import PromptTemplate
+
+logger = logging.getLogger(__name__)
+
+
+class PromptTooLargeError(Exception):
+    """Exception raised when a prompt exceeds the hard size limit."""
+
+    def __init__(self, estimated_tokens: int, limit: int):
+        super().__init__(f"Prompt is estimated at {estimated_tokens} tokens, above the limit of {limit}.")
+        self.estimated_tokens = estimated_tokens
+        self.limit = limit
+
+
+@dataclass
+class PromptContext:
+    """
+    State passed through the pipeline stages for a single prompt.
+    """
+    prompt: str
+    template: Optional[PromptTemplate] = None
+    estimatedTokens: Optional[int] = None
+    warnings: List[str] = field(default_factory=list)
+
+
+class PromptStage(ABC):
+    @abstractmethod
+    def process(self, context: PromptContext) -> None:
+        """
+        Abstract method to inspect or rewrite the prompt context in place.
+        """
+        pass
+
+
+class PromptPipeline():
+    """
+    Runs the configured stages over a prompt before it is sent to the LLM.
+    """
+
+    def __init__(self, stages: List[PromptStage]):
+        self.stages = stages
+
+    def run(self, prompt: str, template: Optional[PromptTemplate] = None) -> PromptContext:
+        context = PromptContext(prompt=prompt, template=template)
+        for stage in self.stages:
+            stage.process(context)
+        return context
+
+
+class RawLengthGuardStage(PromptStage):
+    """
+    Rejects prompts whose raw length alone puts them far above the hard token limit,
+    before any regex or estimation work is spent on them. The bound assumes at most
+    characters_per_token characters per token, well above the ratio of real text.
+    """
+
+    def __init__(self, hard_limit: int, characters_per_token: int = 8):
+        self.hard_limit = hard_limit
+        self.characters_per_token = characters_per_token
+
+    def process(self, context: PromptContext) -> None:
+        if len(context.prompt) > self.hard_limit * self.characters_per_token:
+            raise PromptTooLargeError(math.ceil(len(context.prompt) / self.characters_per_token), self.hard_limit)
+
+
+class WhitespaceNormalizationStage(PromptStage):
+    """
+    Normalizes line endings, trims trailing and repeated inline whitespace and
+    collapses runs of blank lines, leaving leading indentation untouched.
+    """
+    _INLINE_WHITESPACE = re.compile(r"(?<=\S)[ \t]{2,}(?=\S)")
+    _BLANK_LINES = re.compile(r"\n{3,}")
+
+    def process(self, context: PromptContext) -> None:
+        text = context.prompt.replace("\r\n", "\n").replace("\r", "\n")
+        text = self._INLINE_WHITESPACE.sub(" ", text)
+        # Stripped per line: a "[ \t]+$" regex backtracks quadratically over long indentation
+        text = "\n".join(line.rstrip(" \t") for line in text.split("\n"))
+        text = self._BLANK_LINES.sub("\n\n", text)
+        context.prompt = text.strip()
+
+
+class DuplicateContentStage(PromptStage):
+    """
+    Drops paragraphs that repeat an earlier paragraph of the same prompt, such as
+    pasted content sent twice. Short paragraphs are kept, since repeating them is
+    usually intentional.
+    """
+
+    def __init__(self, min_paragraph_length: int = 40):
+        self.min_paragraph_length = min_paragraph_length
+
+    def process(self, context: PromptContext) -> None:
+        original = context.prompt.split("\n\n")
+        seen = set()
+        paragraphs = []
+        for paragraph in original:
+            if len(paragraph) >= self.min_paragraph_length:
+                if paragraph in seen:
+                    continue
+                seen.add(paragraph)
+            paragraphs.append(paragraph)
+
+        if len(paragraphs) != len(original):
+            context.warnings.append("Duplicate paragraphs removed from prompt.")
+        context.prompt = "\n\n".join(paragraphs)
+
+
+class TokenEstimator():
+    """
+    Fast local approximation of the provider's token count.
+
+    Words count as one token per four characters (at least one) and every other
+    non-space character as one token. Estimates are cached by content digest, so
+    repeated prompts and shared template prefixes are only scanned once.
+    """
+    _PIECES = re.compile(r"\w+|[^\w\s]")
+
+    def __init__(self, cache_size: int = 1024):
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[bytes, int]" = OrderedDict()
+
+    def estimate(self, text: str) -> int:
+        key = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        tokens = sum(math.ceil(len(piece) / 4) for piece in self._PIECES.findall(text))
+        self._cache[key] = tokens
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return tokens
+
+
+class TokenEstimationStage(PromptStage):
+    """
+    Stores the estimated token count of the prompt plus its template prefix.
+    """
+
+    def __init__(self, estimator: TokenEstimator):
+        self.estimator = estimator
+
+    def process(self, context: PromptContext) -> None:
+        tokens = self.estimator.estimate(context.prompt)
+        if context.template is not None:
+            tokens += self.estimator.estimate(context.template.content)
+        context.estimatedTokens = tokens
+
+
+class SizeGuardStage(PromptStage):
+    """
+    Rejects prompts above the hard token limit, when one is set, and flags prompts above
+    the soft limit. Must run after TokenEstimationStage.
+    """
+
+    def __init__(self, soft_limit: int, hard_limit: Optional[int] = None):
+        if hard_limit is not None and soft_limit > hard_limit:
+            raise ValueError("The soft prompt token limit must not exceed the hard limit.")
+        self.soft_limit = soft_limit
+        self.hard_limit = hard_limit
+
+    def process(self, context: PromptContext) -> None:
+        if context.estimatedTokens is None:
+            raise ValueError("SizeGuardStage requires an estimated token count.")
+
+        if self.hard_limit is not None and context.estimatedTokens > self.hard_limit:
+            raise PromptTooLargeError(context.estimatedTokens, self.hard_limit)
+        if context.estimatedTokens > self.soft_limit:
+            logger.warning(
+                f"Prompt is estimated at {context.estimatedTokens} tokens, above the soft limit of {self.soft_limit}."
+            )
+            context.warnings.append("Prompt exceeds the soft token limit.")
+
+
+def build_default_pipeline(
+    soft_limit: int,
+    hard_limit: Optional[int] = None,
+    estimate_cache_size: int = 1024
+) -> PromptPipeline:
+    """
+    Returns the standard pipeline: a raw length check (only with a hard limit),
+    normalization, deduplication, estimation and size guards.
+    """
+    stages = [] if hard_limit is None else [RawLengthGuardStage(hard_limit=hard_limit)]
+    return PromptPipeline(stages=[
+        *stages,
+        WhitespaceNormalizationStage(),
+        DuplicateContentStage(),
+        TokenEstimationStage(TokenEstimator(cache_size=estimate_cache_size)),
+        SizeGuardStage(soft_limit=soft_limit, hard_limit=hard_limit),
+    ])
@@ -0,0 +1,29 @@
+from typing import Dict
+
+from src.domain.entities.prompt_template import PromptTemplate
+
+
+class TemplateNotFoundError(Exception):
+    """Exception raised when a request references an unknown prompt template."""
+    pass
+
+
+class PromptTemplateRegistry():
+    """
+    Server-side registry of shared prompt templates, keyed by template ID.
+    """
+
+    def __init__(self, templates: Dict[str, str]):
+        self.templates = {
+            template_id: PromptTemplate(id=template_id, content=content)
+            for template_id, content in templates.items()
+        }
+
+    def get(self, template_id: str) -> PromptTemplate:
+        """
+        Returns the template registered under the given ID.
+        """
+        try:
+            return self.templates[template_id]
+        except KeyError:
+            raise TemplateNotFoundError(f"Unknown prompt template '{template_id}'.")
@@ -1,4 +1,9 @@
 from abc import ABC, abstractmethod
+from typing import AsyncIterator, Optional
+
+from src.domain.entities.generation_config import GenerationConfig
+from src.domain.entities.llm_response import LLMResponse
+from src.domain.entities.prompt_template import PromptTemplate
 
 class LLMGenerationError(Exception):
     """Exception raised when LLM fails to generate a response."""
@@ -7,12 +12,36 @@ class LLMGenerationError(Exception):
 
 class LLMClient(ABC):
     @abstractmethod
-    def generate_text(prompt, config):
+    async def generate_text(
+        self,
+        prompt: str,
+        config: Optional[GenerationConfig] = None,
+        template: Optional[PromptTemplate] = None
+    ) -> LLMResponse:
+        """
+        Abstract method to generate a response for the prompt, with the provider's prompt token count.
+        When no config is given, the client's default model and parameters are used.
+        Providers should send the template as a system instruction, or template.render(prompt)
+        when they have no such concept.
+        """
         pass
 
+    async def stream_text(
+        self,
+        prompt: str,
+        config: Optional[GenerationConfig] = None,
+        template: Optional[PromptTemplate] = None
+    ) -> AsyncIterator[LLMResponse]:
+        """
+        Yields the response for the prompt in chunks as they are generated. The last chunk
+        carrying a prompt token count holds the final usage.
+        Providers without streaming support yield the complete response as a single chunk.
+        """
+        yield await self.generate_text(prompt, config, template)
+
     @abstractmethod
     def get_model_name(self) -> str:
         """
         Abstract method to get the name of the LLM model being used.
         """
-        pass
\ No newline at end of file
+        pass
@@ -1,7 +1,9 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Literal, Optional
 from datetime import datetime
 
+from src.domain.entities.generation_config import GenerationConfig
+
 class ChatInteraction(BaseModel):
     id: Optional[str] = None
     userId: str
@@ -9,3 +11,11 @@ class ChatInteraction(BaseModel):
     response: str
     model: str
     timestamp: datetime
+    generationConfig: Optional[GenerationConfig] = None
+    templateId: Optional[str] = None
+    # Local estimate of the prompt size (including any template), to compare with provider usage
+    estimatedTokens: Optional[int] = None
+    # Prompt tokens reported by the provider, when it reports usage
+    promptTokens: Optional[int] = None
+    # "cancelled" marks interactions abandoned by the client; their response may be partial
+    status: Literal["completed", "cancelled"] = "completed"
@@ -0,0 +1,16 @@
+from pydantic import BaseModel, ConfigDict
+from typing import Optional
+
+class GenerationConfig(BaseModel):
+    """
+    Effective generation parameters for a single LLM call, resolved from a model tier.
+    Instances are immutable so they can be shared and used as cache keys.
+    """
+    model_config = ConfigDict(frozen=True)
+
+    tier: str
+    model: str
+    maxOutputTokens: Optional[int] = None
+    temperature: Optional[float] = None
+    topP: Optional[float] = None
+    topK: Optional[int] = None
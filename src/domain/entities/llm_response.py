@@ -0,0 +1,10 @@
+from pydantic import BaseModel
+from typing import Optional
+
+class LLMResponse(BaseModel):
+    """
+    Text generated by the LLM, with the prompt size the provider billed for it when reported.
+    When streaming, each chunk holds its text delta and the usage reported so far.
+    """
+    text: str
+    promptTokens: Optional[int] = None
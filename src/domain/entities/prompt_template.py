@@ -0,0 +1,16 @@
+from pydantic import BaseModel, ConfigDict
+
+class PromptTemplate(BaseModel):
+    """
+    A shared instruction prefix that requests can reference by ID.
+    """
+    model_config = ConfigDict(frozen=True)
+
+    id: str
+    content: str
+
+    def render(self, prompt: str) -> str:
+        """
+        Returns the template content followed by the user prompt, for providers without system instructions.
+        """
+        return f"{self.content}\n\n{prompt}"
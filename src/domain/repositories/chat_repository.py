@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from typing import Optional
 from src.domain.entities.chat_interaction import ChatInteraction
 
 
@@ -7,6 +8,11 @@ class ChatSaveError(Exception):
     pass
 
 
+class ChatRetrievalError(Exception):
+    """Exception raised when a chat interaction cannot be retrieved."""
+    pass
+
+
 class ChatRepository(ABC):
     @abstractmethod
     async def create_chat_interaction(self, chat_interaction: ChatInteraction) -> ChatInteraction:
@@ -14,3 +20,11 @@ class ChatRepository(ABC):
         Abstract method to create a new chat interaction.
         """
         pass
+
+    @abstractmethod
+    async def get_chat_interaction(self, interaction_id: str) -> Optional[ChatInteraction]:
+        """
+        Abstract method to retrieve a chat interaction by its ID.
+        Returns None when no interaction exists with the given ID.
+        """
+        pass
@@ -1,32 +1,144 @@
 import logging
+from functools import lru_cache
+from typing import AsyncIterator, Optional, Tuple
 from google import genai
+from google.genai import errors, types
 from src.domain.clients.llm_client import LLMClient, LLMGenerationError
+from src.domain.entities.generation_config import GenerationConfig
+from src.domain.entities.llm_response import LLMResponse
+from src.domain.entities.prompt_template import PromptTemplate
+from src.infrastructure.clients.gemini_context_cache import GeminiContextCache
 
 
 logger = logging.getLogger(__name__)
 
+
+@lru_cache(maxsize=128)
+def build_content_config(config: GenerationConfig) -> types.GenerateContentConfig:
+    """
+    Translates a GenerationConfig into the SDK's request config.
+    Results are cached, so every request on the same tier reuses one object.
+    """
+    return types.GenerateContentConfig(
+        max_output_tokens=config.maxOutputTokens,
+        temperature=config.temperature,
+        top_p=config.topP,
+        top_k=config.topK,
+    )
+
+
 class GeminiClient(LLMClient):
-    def __init__(self, genai_client=None):
+    def __init__(self, genai_client=None, context_cache: Optional[GeminiContextCache] = None):
         self.client = genai_client if genai_client is not None else genai.Client()
         self.model_name = "gemini-2.5-flash"
+        self.context_cache = context_cache if context_cache is not None else GeminiContextCache(self.client)
     
-    def generate_text(self, prompt, config = None):
+    async def generate_text(
+        self,
+        prompt,
+        config: Optional[GenerationConfig] = None,
+        template: Optional[PromptTemplate] = None
+    ) -> LLMResponse:
+        model_name, contents, content_config = await self._prepare_request(prompt, config, template)
         try:
-            logger.info(f"Generating response using model: {self.model_name}")
-            response = self.client.models.generate_content(
-                model=self.model_name,
-                contents=prompt,
+            logger.info(f"Generating response using model: {model_name}")
+            response = await self.client.aio.models.generate_content(
+                model=model_name,
+                contents=contents,
+                config=content_config,
             )
 
             logger.info("LLM response generated successfully.")
-            return response.text
+            return LLMResponse(text=response.text, promptTokens=self._prompt_tokens(response))
     
         except Exception as e:
-            logger.error("An unexpected error occurred during LLM generation.")
-            raise LLMGenerationError(f"An unexpected error occurred during LLM response generation: {e}") from e
+            await self._handle_generation_error(e, model_name, content_config, template)
+
+    async def stream_text(
+        self,
+        prompt,
+        config: Optional[GenerationConfig] = None,
+        template: Optional[PromptTemplate] = None
+    ) -> AsyncIterator[LLMResponse]:
+        model_name, contents, content_config = await self._prepare_request(prompt, config, template)
+        try:
+            logger.info(f"Streaming response using model: {model_name}")
+            stream = await self.client.aio.models.generate_content_stream(
+                model=model_name,
+                contents=contents,
+                config=content_config,
+            )
+            async for chunk in stream:
+                prompt_tokens = self._prompt_tokens(chunk)
+                # The final chunk may carry only usage metadata
+                if chunk.text or prompt_tokens is not None:
+                    yield LLMResponse(text=chunk.text or "", promptTokens=prompt_tokens)
+
+            logger.info("LLM response streamed successfully.")
+
+        except Exception as e:
+            await self._handle_generation_error(e, model_name, content_config, template)
     
     def get_model_name(self) -> str:
         """
         Returns the name of the LLM model being used.
         """
         return self.model_name
+
+    async def _prepare_request(
+        self,
+        prompt: str,
+        config: Optional[GenerationConfig],
+        template: Optional[PromptTemplate]
+    ) -> Tuple[str, str, Optional[types.GenerateContentConfig]]:
+        """
+        Resolves the model, contents and SDK config. The template is always a system
+        instruction: served from a context cache when possible and sent inline otherwise.
+        """
+        model_name = config.model if config is not None else self.model_name
+        contents = prompt
+        content_config = build_content_config(config) if config is not None else None
+
+        if template is not None:
+            cache_name = await self.context_cache.get_cache_name(template, model_name)
+            if cache_name is None:
+                update = {"system_instruction": template.content}
+            else:
+                update = {"cached_content": cache_name}
+            base_config = content_config if content_config is not None else types.GenerateContentConfig()
+            content_config = base_config.model_copy(update=update)
+
+        return model_name, contents, content_config
+
+    async def _handle_generation_error(
+        self,
+        error: Exception,
+        model_name: str,
+        content_config: Optional[types.GenerateContentConfig],
+        template: Optional[PromptTemplate]
+    ):
+        logger.error("An unexpected error occurred during LLM generation.")
+        cache_name = content_config.cached_content if content_config is not None else None
+        if cache_name is not None and self._is_cached_content_error(error):
+            # The cache was evicted or rejected upstream; recreate it on the next request
+            await self.context_cache.invalidate(template, model_name, cache_name)
+        raise LLMGenerationError(f"An unexpected error occurred during LLM response generation: {error}") from error
+
+    @staticmethod
+    def _prompt_tokens(response: types.GenerateContentResponse) -> Optional[int]:
+        """
+        Prompt tokens billed by the provider, including any cached template prefix.
+        """
+        if response.usage_metadata is None:
+            return None
+        return response.usage_metadata.prompt_token_count
+
+    @staticmethod
+    def _is_cached_content_error(error: Exception) -> bool:
+        """
+        Whether the provider rejected the request because the cached content is missing,
+        expired or otherwise unusable, as opposed to a failure unrelated to the cache.
+        """
+        if not isinstance(error, errors.APIError) or error.code not in (400, 403, 404):
+            return False
+        return "cache" in (error.message or "").lower()
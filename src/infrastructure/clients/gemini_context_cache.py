@@ -0,0 +1,125 @@
+import asyncio
+import hashlib
+import logging
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Tuple
+
+from google.genai import types
+from src.domain.entities.prompt_template import PromptTemplate
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _CacheEntry:
+    name: Optional[str]
+    expires_at: float
+
+
+class GeminiContextCache:
+    """
+    Manages Gemini explicit context caches holding prompt template prefixes.
+
+    One cache is kept per (template, content, model). Caches are refreshed when they
+    get close to expiring and recreated once expired. When a cache cannot be created
+    (for example, when the prefix is below the provider's minimum size) the failure is
+    remembered for one TTL period and callers send the template inline.
+
+    Fresh entries are served without locking; creation and refresh are serialized per
+    key, so a slow upstream call only holds back requests for the same template and model.
+    """
+
+    def __init__(
+        self,
+        genai_client,
+        ttl_seconds: int = 3600,
+        refresh_margin_seconds: int = 300,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.client = genai_client
+        self.ttl_seconds = ttl_seconds
+        self.refresh_margin_seconds = refresh_margin_seconds
+        self.clock = clock
+        self._entries: Dict[Tuple[str, str, str], _CacheEntry] = {}
+        self._locks: Dict[Tuple[str, str, str], asyncio.Lock] = {}
+
+    async def get_cache_name(self, template: PromptTemplate, model: str) -> Optional[str]:
+        """
+        Returns the name of a live cache for the template prefix on the given model,
+        or None when the caller should send the template inline.
+        """
+        key = self._key(template, model)
+        entry = self._entries.get(key)
+        if self._is_fresh(entry):
+            return entry.name
+
+        async with self._locks.setdefault(key, asyncio.Lock()):
+            # Another request may have created or refreshed the entry while this one waited
+            entry = self._entries.get(key)
+            if self._is_fresh(entry):
+                return entry.name
+
+            now = self.clock()
+            if entry is not None and entry.name is not None and entry.expires_at > now:
+                if await self._refresh(entry, now):
+                    return entry.name
+
+            entry = await self._create(template, model, now)
+            self._entries[key] = entry
+            return entry.name
+
+    async def invalidate(self, template: PromptTemplate, model: str, name: str) -> None:
+        """
+        Forgets the named cache for the template so the next request recreates it, deleting
+        it upstream first so a cache that still exists does not keep being billed.
+        Does nothing if the entry has already been replaced by another request.
+        """
+        key = self._key(template, model)
+        entry = self._entries.get(key)
+        if entry is None or entry.name != name:
+            return
+
+        try:
+            await self.client.aio.caches.delete(name=name)
+        except Exception as e:
+            logger.warning(f"Could not delete context cache {name}: {e}")
+        if self._entries.get(key) is entry:
+            del self._entries[key]
+
+    def _is_fresh(self, entry: Optional[_CacheEntry]) -> bool:
+        return entry is not None and entry.expires_at - self.clock() > self.refresh_margin_seconds
+
+    @staticmethod
+    def _key(template: PromptTemplate, model: str) -> Tuple[str, str, str]:
+        content_hash = hashlib.sha256(template.content.encode("utf-8")).hexdigest()
+        return (template.id, content_hash, model)
+
+    async def _create(self, template: PromptTemplate, model: str, now: float) -> _CacheEntry:
+        try:
+            cached_content = await self.client.aio.caches.create(
+                model=model,
+                config=types.CreateCachedContentConfig(
+                    display_name=f"template-{template.id}",
+                    system_instruction=template.content,
+                    ttl=f"{self.ttl_seconds}s",
+                ),
+            )
+            logger.info(f"Created context cache {cached_content.name} for template {template.id}")
+            return _CacheEntry(name=cached_content.name, expires_at=now + self.ttl_seconds)
+        except Exception as e:
+            logger.warning(f"Could not create context cache for template {template.id}, sending it inline: {e}")
+            return _CacheEntry(name=None, expires_at=now + self.ttl_seconds)
+
+    async def _refresh(self, entry: _CacheEntry, now: float) -> bool:
+        try:
+            await self.client.aio.caches.update(
+                name=entry.name,
+                config=types.UpdateCachedContentConfig(ttl=f"{self.ttl_seconds}s"),
+            )
+            entry.expires_at = now + self.ttl_seconds
+            return True
+        except Exception as e:
+            logger.warning(f"Could not refresh context cache {entry.name}, recreating it: {e}")
+            return False
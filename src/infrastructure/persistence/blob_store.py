@@ -0,0 +1,107 @@
+import hashlib
+import logging
+from collections import Counter
+from typing import Dict, Iterable, Optional
+
+from pymongo import UpdateOne
+from pymongo.database import Database
+
+try:
+    import zstandard
+except ImportError:  # zstd compression is optional
+    zstandard = None
+
+
+logger = logging.getLogger(__name__)
+
+
+class ContentBlobStore:
+    """
+    Content-addressed storage for text bodies.
+
+    Each distinct text is stored once in the blobs collection, keyed by the
+    SHA-256 hash of its UTF-8 encoding, and carries a reference count that is
+    maintained through bulk writes.
+    """
+
+    def __init__(self, database: Database, compression: Optional[str] = None):
+        if compression not in (None, "zstd"):
+            raise ValueError(f"Unsupported blob compression: {compression}")
+        if compression == "zstd" and zstandard is None:
+            raise ValueError("zstd blob compression requires the 'zstandard' package to be installed.")
+
+        self.collection = database["chat_blobs"]
+        self.compression = compression
+
+    @staticmethod
+    def content_hash(text: str) -> str:
+        """
+        Returns the content address of a text body.
+        """
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    async def acquire(self, texts: Iterable[str]) -> Dict[str, str]:
+        """
+        Stores the given texts (if not stored yet) and increments their reference counts.
+        Returns a mapping from each text to its content hash.
+        """
+        texts = list(texts)
+        if not texts:
+            return {}
+
+        hashes = {text: self.content_hash(text) for text in texts}
+        references = Counter(hashes[text] for text in texts)
+        bodies = {content_hash: text for text, content_hash in hashes.items()}
+
+        operations = [
+            UpdateOne(
+                {"_id": content_hash},
+                {
+                    "$setOnInsert": self._encode(bodies[content_hash]),
+                    "$inc": {"refCount": count},
+                },
+                upsert=True,
+            )
+            for content_hash, count in references.items()
+        ]
+        await self.collection.bulk_write(operations, ordered=False)
+        return hashes
+
+    async def release(self, content_hashes: Iterable[str]) -> None:
+        """
+        Decrements the reference counts of the given blobs.
+        """
+        references = Counter(content_hashes)
+        if not references:
+            return
+
+        operations = [
+            UpdateOne({"_id": content_hash}, {"$inc": {"refCount": -count}})
+            for content_hash, count in references.items()
+        ]
+        await self.collection.bulk_write(operations, ordered=False)
+
+    async def fetch(self, content_hashes: Iterable[str]) -> Dict[str, str]:
+        """
+        Returns a mapping from content hash to the decoded text body.
+        """
+        cursor = self.collection.find({"_id": {"$in": list(set(content_hashes))}})
+        documents = await cursor.to_list(length=None)
+        return {document["_id"]: self._decode(document) for document in documents}
+
+    def _encode(self, text: str) -> dict:
+        if self.compression == "zstd":
+            data = zstandard.ZstdCompressor().compress(text.encode("utf-8"))
+            return {"data": data, "compression": "zstd"}
+        return {"data": text}
+
+    @staticmethod
+    def _decode(document: dict) -> str:
+        if document.get("compression") == "zstd":
+            if zstandard is None:
+                raise ValueError("zstd blob compression requires the 'zstandard' package to be installed.")
+            try:
+                return zstandard.ZstdDecompressor().decompress(document["data"]).decode("utf-8")
+            except zstandard.ZstdError as e:
+                raise ValueError(f"Blob {document.get('_id')} is not valid zstd data: {e}") from e
+        return document["data"]
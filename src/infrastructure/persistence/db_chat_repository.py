@@ -1,29 +1,88 @@
+import asyncio
 import logging
+from typing import Optional
 
+from bson import ObjectId
+from bson.errors import InvalidId
 from src.domain.repositories.chat_repository import ChatRepository
 from pymongo.database import Database
+from pydantic import ValidationError
 from pymongo.errors import PyMongoError
 from src.domain.entities.chat_interaction import ChatInteraction
-from src.domain.repositories.chat_repository import ChatSaveError
+from src.domain.repositories.chat_repository import ChatSaveError, ChatRetrievalError
+from src.infrastructure.persistence.blob_store import ContentBlobStore
 
 
 logger = logging.getLogger(__name__)
 
 
 class DatabaseChatRepository(ChatRepository):
-    def __init__(self, database: Database):
+    def __init__(self, database: Database, deduplicate: bool = False, compression: Optional[str] = None):
         self.collection = database["chat_interactions"]
+        self.blob_store = ContentBlobStore(database, compression=compression) if deduplicate else None
 
     async def create_chat_interaction(self, chat_interaction: ChatInteraction) -> ChatInteraction:
         """
         Creates a new chat interaction in the database.
+        In deduplicated mode the prompt and response bodies are stored in the blob
+        collection and the interaction only keeps their content hashes.
         """
         try:
-            result = await self.collection.insert_one(chat_interaction.model_dump(by_alias=True, exclude_none=True))
-        
+            if self.blob_store is None:
+                document = chat_interaction.model_dump(by_alias=True, exclude_none=True)
+                result = await self.collection.insert_one(document)
+            else:
+                result = await self._insert_deduplicated(chat_interaction)
+
             if not chat_interaction.id and result.inserted_id:
                 logger.info(f"Chat interaction created with ID: {result.inserted_id}")
                 return str(result.inserted_id)
         except PyMongoError as e:
             logger.error(f"Error creating chat interaction: {e}")
             raise ChatSaveError(f"Failed to save chat interaction to database: {e}")
+
+    async def get_chat_interaction(self, interaction_id: str) -> Optional[ChatInteraction]:
+        """
+        Retrieves a chat interaction by its ID, resolving deduplicated bodies if needed.
+        """
+        try:
+            object_id = ObjectId(interaction_id)
+        except (InvalidId, TypeError):
+            return None
+
+        try:
+            document = await self.collection.find_one({"_id": object_id})
+            if document is None:
+                return None
+
+            document["id"] = str(document.pop("_id"))
+            if "promptHash" in document:
+                prompt_hash = document.pop("promptHash")
+                response_hash = document.pop("responseHash")
+                if self.blob_store is None:
+                    raise ChatRetrievalError(
+                        f"Chat interaction {interaction_id} is deduplicated but no blob store is configured."
+                    )
+                bodies = await self.blob_store.fetch([prompt_hash, response_hash])
+                document["prompt"] = bodies[prompt_hash]
+                document["response"] = bodies[response_hash]
+
+            return ChatInteraction(**document)
+        except (PyMongoError, KeyError, ValidationError, ValueError) as e:
+            # ValidationError: malformed document; ValueError: undecodable blob body
+            logger.error(f"Error retrieving chat interaction {interaction_id}: {e}")
+            raise ChatRetrievalError(f"Failed to retrieve chat interaction from database: {e}")
+
+    async def _insert_deduplicated(self, chat_interaction: ChatInteraction):
+        hashes = await self.blob_store.acquire([chat_interaction.prompt, chat_interaction.response])
+        document = chat_interaction.model_dump(by_alias=True, exclude_none=True, exclude={"prompt", "response"})
+        document["promptHash"] = hashes[chat_interaction.prompt]
+        document["responseHash"] = hashes[chat_interaction.response]
+
+        try:
+            return await self.collection.insert_one(document)
+        except BaseException:
+            # Undo the references taken above so orphaned blobs keep an accurate count, also when
+            # the save is cancelled by a client disconnect; shielded so the release itself completes
+            await asyncio.shield(self.blob_store.release([document["promptHash"], document["responseHash"]]))
+            raise
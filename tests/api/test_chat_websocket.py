@@ -0,0 +1,291 @@
+import asyncio
+import threading
+import pytest
+from fastapi import FastAPI, status
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+from unittest.mock import AsyncMock, Mock
+
+from src.api.router import api_router
+from src.api.chat_websocket import ChatTurnRequest, ChatWebSocketSession
+from src.api.dependencies import (
+    get_chat_service_dependency,
+    get_generation_config_resolver_dependency,
+    get_prompt_template_registry_dependency,
+)
+from src.application.services.chat_service import ChatService, ChatProcessingError
+from src.application.services.generation_config_resolver import GenerationConfigResolver
+from src.application.services.generation_metrics import GenerationMetrics
+from src.application.services.prompt_template_registry import PromptTemplateRegistry
+from src.domain.clients.llm_client import LLMClient
+from src.domain.entities.chat_interaction import ChatInteraction
+from src.domain.entities.llm_response import LLMResponse
+from src.domain.repositories.chat_repository import ChatRepository
+from src.shared.settings import ModelTier, Settings, get_settings
+
+app = FastAPI()
+app.include_router(api_router)
+
+client = TestClient(app)
+
+
+def make_interaction(prompt: str, response: str) -> ChatInteraction:
+    return ChatInteraction(
+        id="test-id-123",
+        userId="user123",
+        prompt=prompt,
+        response=response,
+        model="gemini-2.5-flash",
+        timestamp="2024-07-21T10:00:00Z"
+    )
+
+
+@pytest.fixture
+def mock_chat_service():
+    """
+    Fixture to provide a mock ChatService whose chat_stream streams the words of a fixed answer.
+    """
+    service = AsyncMock(spec=ChatService)
+
+    async def chat_stream(prompt, on_token, user_id=None, config=None, template=None):
+        for word in ["Hi ", "there!"]:
+            await on_token(word)
+        return make_interaction(prompt, "Hi there!")
+
+    service.chat_stream.side_effect = chat_stream
+    return service
+
+@pytest.fixture
+def settings():
+    """
+    Fixture to provide Settings with WebSocket limits suited to fast tests.
+    """
+    return Settings(
+        gemini_api_key="test-key",
+        ws_send_queue_size=8,
+        ws_send_timeout_seconds=1.0,
+        ws_max_concurrent_turns=1,
+        ws_heartbeat_interval_seconds=60.0,
+        ws_heartbeat_timeout_seconds=120.0
+    )
+
+@pytest.fixture(autouse=True)
+def override_dependency(mock_chat_service, settings):
+    """
+    Fixture to override the dependencies resolved for the WebSocket connection.
+    """
+    resolver = GenerationConfigResolver(
+        tiers={"standard": ModelTier(models=["gemini-2.5-flash"], max_output_tokens=8192)},
+        default_tier="standard"
+    )
+    registry = PromptTemplateRegistry(templates={})
+    app.dependency_overrides[get_chat_service_dependency] = lambda: mock_chat_service
+    app.dependency_overrides[get_generation_config_resolver_dependency] = lambda: resolver
+    app.dependency_overrides[get_prompt_template_registry_dependency] = lambda: registry
+    app.dependency_overrides[get_settings] = lambda: settings
+    yield
+    app.dependency_overrides.clear()
+
+
+def test_chat_turn_streams_tokens():
+    """
+    Test that a chat turn streams its tokens and finishes with the full response.
+    """
+    with client.websocket_connect("/v1/chat/ws") as websocket:
+        websocket.send_json({"type": "chat", "requestId": "1", "userId": "user123", "prompt": "Hello"})
+
+        assert websocket.receive_json() == {"type": "token", "requestId": "1", "text": "Hi "}
+        assert websocket.receive_json() == {"type": "token", "requestId": "1", "text": "there!"}
+        done = websocket.receive_json()
+        assert done["type"] == "done"
+        assert done["requestId"] == "1"
+        assert done["response"]["response"] == "Hi there!"
+        assert done["response"]["prompt"] == "Hello"
+
+def test_multiple_turns_share_session_dependencies(mock_chat_service):
+    """
+    Test that several turns on one connection reuse the same ChatService.
+    """
+    with client.websocket_connect("/v1/chat/ws") as websocket:
+        for request_id in ["1", "2"]:
+            websocket.send_json({"type": "chat", "requestId": request_id, "userId": "user123", "prompt": "Hello"})
+            messages = [websocket.receive_json() for _ in range(3)]
+            assert messages[-1]["type"] == "done"
+            assert messages[-1]["requestId"] == request_id
+
+    assert mock_chat_service.chat_stream.call_count == 2
+
+def test_ping_pong():
+    """
+    Test that a client ping is answered with a pong.
+    """
+    with client.websocket_connect("/v1/chat/ws") as websocket:
+        websocket.send_json({"type": "ping"})
+        assert websocket.receive_json() == {"type": "pong"}
+
+def test_invalid_chat_message():
+    """
+    Test that an invalid chat message is reported without closing the connection.
+    """
+    with client.websocket_connect("/v1/chat/ws") as websocket:
+        websocket.send_json({"type": "chat", "requestId": "1", "userId": "user123"})
+        error = websocket.receive_json()
+        assert error["type"] == "error"
+        assert error["requestId"] == "1"
+
+        websocket.send_json({"type": "ping"})
+        assert websocket.receive_json() == {"type": "pong"}
+
+@pytest.mark.parametrize("send", [
+    lambda websocket: websocket.send_text("not json"),
+    lambda websocket: websocket.send_bytes(b'{"type": "ping"}'),
+])
+def test_non_json_text_frames_are_rejected(send):
+    """
+    Test that malformed JSON and binary frames are reported without closing the connection.
+    """
+    with client.websocket_connect("/v1/chat/ws") as websocket:
+        send(websocket)
+        assert websocket.receive_json() == {
+            "type": "error",
+            "detail": "Messages must be JSON objects sent as text frames."
+        }
+
+        websocket.send_json({"type": "ping"})
+        assert websocket.receive_json() == {"type": "pong"}
+
+def test_invalid_generation_config():
+    """
+    Test that a turn with a model outside the configured tiers is rejected.
+    """
+    with client.websocket_connect("/v1/chat/ws") as websocket:
+        websocket.send_json({"type": "chat", "requestId": "1", "userId": "user123", "prompt": "Hi", "model": "other"})
+        error = websocket.receive_json()
+        assert error == {"type": "error", "requestId": "1", "detail": "Model 'other' is not allowed in any tier."}
+
+def test_chat_processing_error(mock_chat_service):
+    """
+    Test that a failed turn is reported as an error message.
+    """
+    mock_chat_service.chat_stream.side_effect = ChatProcessingError("Failed to process chat.")
+
+    with client.websocket_connect("/v1/chat/ws") as websocket:
+        websocket.send_json({"type": "chat", "requestId": "1", "userId": "user123", "prompt": "Hello"})
+        error = websocket.receive_json()
+        assert error["type"] == "error"
+        assert error["requestId"] == "1"
+        assert error["detail"] == "An unexpected error happening while processing the chat request."
+
+@pytest.mark.asyncio
+async def test_chat_processing_error_waits_for_queue_room():
+    """
+    Test that the terminal error of a failed turn is queued even when the send queue is momentarily full.
+    """
+    websocket = AsyncMock()
+    service = AsyncMock(spec=ChatService)
+    service.chat_stream.side_effect = ChatProcessingError("Failed to process chat.")
+    session = ChatWebSocketSession(
+        websocket=websocket,
+        chat_service=service,
+        config_resolver=GenerationConfigResolver(
+            tiers={"standard": ModelTier(models=["gemini-2.5-flash"], max_output_tokens=8192)},
+            default_tier="standard"
+        ),
+        template_registry=PromptTemplateRegistry(templates={}),
+        send_queue_size=1,
+        send_timeout_seconds=1.0
+    )
+    session._send_queue.put_nowait({"type": "token", "requestId": "0", "text": "pending"})
+
+    turn = asyncio.create_task(session._serve_turn(
+        ChatTurnRequest(requestId="1", userId="user123", prompt="Hello")
+    ))
+    await asyncio.sleep(0.01)
+    assert session._send_queue.get_nowait()["requestId"] == "0"
+    await asyncio.wait_for(turn, timeout=1)
+
+    error = session._send_queue.get_nowait()
+    assert error["type"] == "error"
+    assert error["requestId"] == "1"
+
+def test_concurrent_turn_limit(mock_chat_service):
+    """
+    Test that turns beyond the per-connection limit are rejected while others are in flight.
+    """
+    release = threading.Event()
+
+    async def slow_chat_stream(prompt, on_token, user_id=None, config=None, template=None):
+        while not release.is_set():
+            await asyncio.sleep(0.01)
+        return make_interaction(prompt, "Done")
+
+    mock_chat_service.chat_stream.side_effect = slow_chat_stream
+
+    with client.websocket_connect("/v1/chat/ws") as websocket:
+        websocket.send_json({"type": "chat", "requestId": "1", "userId": "user123", "prompt": "Hello"})
+        websocket.send_json({"type": "chat", "requestId": "2", "userId": "user123", "prompt": "Hello"})
+
+        assert websocket.receive_json() == {"type": "error", "requestId": "2", "detail": "Too many chat turns in flight."}
+        release.set()
+        assert websocket.receive_json()["requestId"] == "1"
+
+def test_heartbeat_ping_and_timeout(settings):
+    """
+    Test that the server pings idle clients and closes connections that stay silent.
+    """
+    settings.ws_heartbeat_interval_seconds = 0.05
+    settings.ws_heartbeat_timeout_seconds = 0.2
+
+    with client.websocket_connect("/v1/chat/ws") as websocket:
+        assert websocket.receive_json() == {"type": "ping"}
+        with pytest.raises(WebSocketDisconnect):
+            while True:
+                websocket.receive_json()
+
+@pytest.mark.asyncio
+async def test_slow_consumer_is_disconnected():
+    """
+    Test that a client that stops reading is disconnected instead of buffering without bound,
+    and that its abandoned turn is recorded and counted as cancelled.
+    """
+    incoming = asyncio.Queue()
+    websocket = AsyncMock()
+    websocket.receive_json.side_effect = incoming.get
+
+    async def never_drains(message):
+        await asyncio.Event().wait()
+
+    websocket.send_json.side_effect = never_drains
+
+    async def endless_stream_text(prompt, config=None, template=None):
+        while True:
+            yield LLMResponse(text="token ")
+
+    llm_client = Mock(spec=LLMClient)
+    llm_client.stream_text = endless_stream_text
+    chat_repository = AsyncMock(spec=ChatRepository)
+    metrics = GenerationMetrics()
+    service = ChatService(llm_client, chat_repository, metrics=metrics)
+
+    session = ChatWebSocketSession(
+        websocket=websocket,
+        chat_service=service,
+        config_resolver=GenerationConfigResolver(
+            tiers={"standard": ModelTier(models=["gemini-2.5-flash"], max_output_tokens=8192)},
+            default_tier="standard"
+        ),
+        template_registry=PromptTemplateRegistry(templates={}),
+        send_queue_size=2,
+        send_timeout_seconds=0.05
+    )
+    await incoming.put({"type": "chat", "requestId": "1", "userId": "user123", "prompt": "Hello"})
+
+    await asyncio.wait_for(session.run(), timeout=2)
+
+    websocket.close.assert_called_once_with(code=status.WS_1008_POLICY_VIOLATION)
+    assert session._send_queue.qsize() <= 2
+    recorded_interaction = chat_repository.create_chat_interaction.call_args[0][0]
+    assert recorded_interaction.status == "cancelled"
+    assert recorded_interaction.response.startswith("token ")
+    assert metrics.cancelled_count == 1
+    assert metrics.completed_count == 0
@@ -1,11 +1,18 @@
+import asyncio
 import pytest
 from fastapi import FastAPI, status
 from fastapi.testclient import TestClient
 from unittest.mock import AsyncMock, MagicMock, patch
 
-from src.api.router import api_router
+from src.api.router import api_router, run_until_disconnected, ClientDisconnectedError, HTTP_499_CLIENT_CLOSED_REQUEST
+from src.api.dependencies import get_generation_metrics_dependency
+from src.application.services.generation_metrics import GenerationMetrics
+from src.application.services.prompt_pipeline import PromptTooLargeError
 from src.application.services.chat_service import ChatService, ChatProcessingError
 from src.domain.entities.chat_interaction import ChatInteraction  # Assuming this model exists
+from src.application.services.generation_config_resolver import GenerationConfigResolver
+from src.application.services.prompt_template_registry import PromptTemplateRegistry
+from src.shared.settings import ModelTier, Settings, get_settings
 
 app = FastAPI()
 app.include_router(api_router)
@@ -42,22 +49,45 @@ def mock_chat_repository():
     mock_repo.save_chat_interaction = AsyncMock(return_value=None) # If it's an async method
     return mock_repo
 
+@pytest.fixture
+def config_resolver():
+    """
+    Fixture to provide a GenerationConfigResolver with a small set of test tiers.
+    """
+    return GenerationConfigResolver(
+        tiers={
+            "standard": ModelTier(models=["gemini-2.5-flash"], max_output_tokens=8192),
+            "fast": ModelTier(models=["gemini-2.5-flash-lite"], max_output_tokens=1024, temperature=0.2),
+        },
+        default_tier="standard"
+    )
+
+@pytest.fixture
+def template_registry():
+    """
+    Fixture to provide a PromptTemplateRegistry with one test template.
+    """
+    return PromptTemplateRegistry(templates={"support": "You are a helpful support agent."})
+
 @pytest.fixture(autouse=True)
-def override_dependency(mock_chat_service):
+def override_dependency(mock_chat_service, config_resolver, template_registry):
     """
     Fixture to override the get_chat_service_dependency for testing.
     This ensures our mock_chat_service is used when the endpoint is called.
     """
-    from src.api.dependencies import get_chat_service_dependency, get_llm_client_dependency, get_chat_repository_dependency
+    from src.api.dependencies import get_chat_service_dependency, get_llm_client_dependency, get_chat_repository_dependency, get_generation_config_resolver_dependency, get_prompt_template_registry_dependency
     print("Overriding get_chat_service_dependency with mock_chat_service")
     app.dependency_overrides[get_chat_service_dependency] = lambda: mock_chat_service
     app.dependency_overrides[get_llm_client_dependency] = lambda: mock_llm_client
     app.dependency_overrides[get_chat_repository_dependency] = lambda: mock_chat_repository
+    app.dependency_overrides[get_generation_config_resolver_dependency] = lambda: config_resolver
+    app.dependency_overrides[get_prompt_template_registry_dependency] = lambda: template_registry
+    app.dependency_overrides[get_settings] = lambda: Settings(gemini_api_key="test-key")
 
 
 # --- Unit Tests for the /v1/chat Endpoint ---
 
-def test_chat_success(mock_chat_service):
+def test_chat_success(mock_chat_service, config_resolver):
     """
     Test case for a successful chat request.
     Verifies that the API returns a ChatResponse with correct data.
@@ -100,10 +130,12 @@ def test_chat_success(mock_chat_service):
     # Verify that the chat service's chat method was called with the correct arguments
     mock_chat_service.chat.assert_called_once_with(
         chat_request_payload["prompt"],
-        chat_request_payload["userId"]
+        chat_request_payload["userId"],
+        config_resolver.resolve(),
+        None
     )
 
-def test_chat_processing_error(mock_chat_service):
+def test_chat_processing_error(mock_chat_service, config_resolver):
     """
     Test case for when the ChatService raises a ChatProcessingError.
     Verifies that the API returns a 500 Internal Server Error.
@@ -130,7 +162,9 @@ def test_chat_processing_error(mock_chat_service):
     # Verify that the chat service's chat method was called
     mock_chat_service.chat.assert_called_once_with(
         chat_request_payload["prompt"],
-        chat_request_payload["userId"]
+        chat_request_payload["userId"],
+        config_resolver.resolve(),
+        None
     )
 
 def test_chat_validation_error_missing_field():
@@ -174,4 +208,170 @@ def test_chat_validation_error_invalid_type():
     # Assert that the response contains validation error details
     response_data = response.json()
     assert "detail" in response_data
-    assert any("string_type" in error["type"] for error in response_data["detail"] if error["loc"][1] == "userId")
\ No newline at end of file
+    assert any("string_type" in error["type"] for error in response_data["detail"] if error["loc"][1] == "userId")
+
+def test_chat_with_tier_and_overrides(mock_chat_service):
+    """
+    Test case for a request that selects a tier and overrides generation parameters.
+    Verifies that the resolved config is passed to the chat service.
+    """
+    mock_chat_service.chat.return_value = ChatInteraction(
+        id="test-id-123",
+        userId="user123",
+        prompt="Hello, AI!",
+        response="Hi there!",
+        model="gemini-2.5-flash-lite",
+        timestamp="2024-07-21T10:00:00Z"
+    )
+
+    response = client.post("/v1/chat", json={
+        "userId": "user123",
+        "prompt": "Hello, AI!",
+        "tier": "fast",
+        "maxOutputTokens": 256,
+        "temperature": 0.7
+    })
+
+    assert response.status_code == status.HTTP_200_OK
+    config = mock_chat_service.chat.call_args[0][2]
+    assert config.tier == "fast"
+    assert config.model == "gemini-2.5-flash-lite"
+    assert config.maxOutputTokens == 256
+    assert config.temperature == 0.7
+
+@pytest.mark.parametrize("overrides", [
+    {"tier": "unknown"},
+    {"model": "not-whitelisted"},
+    {"tier": "fast", "model": "gemini-2.5-flash"},
+    {"tier": "fast", "maxOutputTokens": 4096},
+])
+def test_chat_invalid_generation_config(mock_chat_service, overrides):
+    """
+    Test case for generation parameters that are not allowed by the configured tiers.
+    Verifies that the API returns 400 without calling the chat service.
+    """
+    response = client.post("/v1/chat", json={"userId": "user123", "prompt": "Hello", **overrides})
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    mock_chat_service.chat.assert_not_called()
+
+def test_chat_with_template(mock_chat_service, template_registry):
+    """
+    Test case for a request referencing a registered prompt template.
+    Verifies that the template is passed to the chat service.
+    """
+    mock_chat_service.chat.return_value = ChatInteraction(
+        id="test-id-123",
+        userId="user123",
+        prompt="My order is late.",
+        response="Sorry to hear that!",
+        model="gemini-2.5-flash",
+        timestamp="2024-07-21T10:00:00Z"
+    )
+
+    response = client.post("/v1/chat", json={"userId": "user123", "prompt": "My order is late.", "templateId": "support"})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert mock_chat_service.chat.call_args[0][3] == template_registry.get("support")
+
+def test_chat_with_unknown_template(mock_chat_service):
+    """
+    Test case for a request referencing a template that is not registered.
+    Verifies that the API returns 400 without calling the chat service.
+    """
+    response = client.post("/v1/chat", json={"userId": "user123", "prompt": "Hello", "templateId": "missing"})
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    mock_chat_service.chat.assert_not_called()
+
+
+class FakeRequest:
+    """
+    Minimal stand-in for a Starlette Request whose client disconnects after a number of polls.
+    """
+    def __init__(self, disconnect_after_polls: int):
+        self.polls = 0
+        self.disconnect_after_polls = disconnect_after_polls
+
+    async def is_disconnected(self):
+        self.polls += 1
+        return self.polls >= self.disconnect_after_polls
+
+@pytest.mark.asyncio
+async def test_run_until_disconnected_cancels_work():
+    """
+    Test that the in-flight work is cancelled once the client disconnects.
+    """
+    cancelled = asyncio.Event()
+
+    async def never_finishes():
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    with pytest.raises(ClientDisconnectedError):
+        await run_until_disconnected(FakeRequest(disconnect_after_polls=2), never_finishes(), 0.01)
+
+    assert cancelled.is_set()
+
+@pytest.mark.asyncio
+async def test_run_until_disconnected_returns_result():
+    """
+    Test that the result is returned when the work completes while the client is connected.
+    """
+    async def finishes():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    request = FakeRequest(disconnect_after_polls=1000)
+
+    assert await run_until_disconnected(request, finishes(), 0.01) == "done"
+
+def test_chat_client_disconnected(mock_chat_service):
+    """
+    Test case for a client that disconnects while the chat is being processed.
+    Verifies that the chat is cancelled and the API responds with 499.
+    """
+    async def never_finishes(*args):
+        await asyncio.sleep(60)
+
+    mock_chat_service.chat.side_effect = never_finishes
+
+    with patch("src.api.router.Request.is_disconnected", AsyncMock(return_value=True)):
+        response = client.post("/v1/chat", json={"userId": "user123", "prompt": "Hello"})
+
+    assert response.status_code == HTTP_499_CLIENT_CLOSED_REQUEST
+
+def test_generation_metrics():
+    """
+    Test case for the generation metrics endpoint.
+    """
+    metrics = GenerationMetrics()
+    metrics.record_completed(2.0)
+    metrics.record_cancelled(0.5)
+    app.dependency_overrides[get_generation_metrics_dependency] = lambda: metrics
+
+    response = client.get("/v1/metrics/generation")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {
+        "completedCount": 1,
+        "cancelledCount": 1,
+        "completedSeconds": 2.0,
+        "wastedSeconds": 0.5,
+        "savedSeconds": 1.5,
+    }
+
+def test_chat_prompt_too_large(mock_chat_service):
+    """
+    Test case for a prompt over the hard size limit.
+    Verifies that the API returns 413.
+    """
+    mock_chat_service.chat.side_effect = PromptTooLargeError(estimated_tokens=50000, limit=32000)
+
+    response = client.post("/v1/chat", json={"userId": "user123", "prompt": "Hello"})
+
+    assert response.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    assert response.json()["detail"] == "Prompt is estimated at 50000 tokens, above the limit of 32000."
@@ -1,3 +1,4 @@
+import asyncio
 import pytest
 from unittest.mock import AsyncMock, Mock
 from datetime import datetime
@@ -5,7 +6,11 @@ from datetime import datetime
 from src.domain.clients.llm_client import LLMClient, LLMGenerationError
 from src.domain.repositories.chat_repository import ChatRepository, ChatSaveError
 from src.domain.entities.chat_interaction import ChatInteraction
+from src.domain.entities.generation_config import GenerationConfig
+from src.domain.entities.llm_response import LLMResponse
+from src.domain.entities.prompt_template import PromptTemplate
 from src.application.services.chat_service import ChatService, ChatProcessingError 
+from src.application.services.prompt_pipeline import PromptTooLargeError, TokenEstimator, build_default_pipeline
 
 # Define common test data as module-level constants or within fixtures
 TEST_PROMPT = "Hello, how are you?"
@@ -13,6 +18,9 @@ TEST_USER_ID = "user123"
 TEST_LLM_RESPONSE = "I am doing well, thank you!"
 TEST_CHAT_INTERACTION_ID = "chat_id_abc"
 
+async def never_finishes(*args):
+    await asyncio.sleep(60)
+
 @pytest.fixture
 def mock_llm_client():
     """
@@ -44,7 +52,7 @@ async def test_chat_success(chat_service, mock_llm_client, mock_chat_repository)
     Test that the chat method successfully generates a response,
     saves the interaction, and returns the saved interaction.
     """
-    mock_llm_client.generate_text.return_value = TEST_LLM_RESPONSE
+    mock_llm_client.generate_text.return_value = LLMResponse(text=TEST_LLM_RESPONSE)
 
     expected_chat_interaction = ChatInteraction(
         userId=TEST_USER_ID,
@@ -62,7 +70,7 @@ async def test_chat_success(chat_service, mock_llm_client, mock_chat_repository)
 
     # Assertions
     # 1. Verify LLMClient's generate_text was called correctly
-    mock_llm_client.generate_text.assert_called_once_with(TEST_PROMPT)
+    mock_llm_client.generate_text.assert_called_once_with(TEST_PROMPT, None, None)
 
     # 2. Verify ChatRepository's create_chat_interaction was called
     mock_chat_repository.create_chat_interaction.assert_called_once()
@@ -95,7 +103,7 @@ async def test_chat_llm_generation_error(chat_service, mock_llm_client, mock_cha
         await chat_service.chat(TEST_PROMPT, TEST_USER_ID)
 
     # Verify LLMClient's generate_text was called
-    mock_llm_client.generate_text.assert_called_once_with(TEST_PROMPT)
+    mock_llm_client.generate_text.assert_called_once_with(TEST_PROMPT, None, None)
     # Verify ChatRepository's create_chat_interaction was NOT called
     mock_chat_repository.create_chat_interaction.assert_not_called()
 
@@ -105,7 +113,7 @@ async def test_chat_save_error(chat_service, mock_llm_client, mock_chat_reposito
     Test that the chat method raises ChatProcessingError when saving to repository fails.
     """
     # Configure the mock LLMClient to return a successful response
-    mock_llm_client.generate_text.return_value = TEST_LLM_RESPONSE
+    mock_llm_client.generate_text.return_value = LLMResponse(text=TEST_LLM_RESPONSE)
 
     # Configure the mock ChatRepository to raise ChatSaveError
     mock_chat_repository.create_chat_interaction.side_effect = ChatSaveError("DB save failed")
@@ -115,6 +123,231 @@ async def test_chat_save_error(chat_service, mock_llm_client, mock_chat_reposito
         await chat_service.chat(TEST_PROMPT, TEST_USER_ID)
 
     # Verify LLMClient's generate_text was called
-        mock_llm_client.generate_text.assert_called_once_with(TEST_PROMPT)
+        mock_llm_client.generate_text.assert_called_once_with(TEST_PROMPT, None, None)
     # Verify ChatRepository's create_chat_interaction was called (as the error happens during save)
         mock_chat_repository.create_chat_interaction.assert_called_once()
+
+@pytest.mark.asyncio
+async def test_chat_with_generation_config(chat_service, mock_llm_client, mock_chat_repository):
+    """
+    Test that the generation config is passed to the LLM client and recorded on the interaction.
+    """
+    config = GenerationConfig(tier="fast", model="fast-model", maxOutputTokens=256)
+    mock_llm_client.generate_text.return_value = LLMResponse(text=TEST_LLM_RESPONSE)
+    mock_chat_repository.create_chat_interaction.return_value = TEST_CHAT_INTERACTION_ID
+
+    returned_interaction = await chat_service.chat(TEST_PROMPT, TEST_USER_ID, config)
+
+    mock_llm_client.generate_text.assert_called_once_with(TEST_PROMPT, config, None)
+    assert returned_interaction.model == "fast-model"
+    assert returned_interaction.generationConfig == config
+
+@pytest.mark.asyncio
+async def test_chat_with_template(chat_service, mock_llm_client, mock_chat_repository):
+    """
+    Test that the template is passed to the LLM client and its ID recorded on the interaction.
+    """
+    template = PromptTemplate(id="support", content="You are a helpful support agent.")
+    mock_llm_client.generate_text.return_value = LLMResponse(text=TEST_LLM_RESPONSE)
+    mock_chat_repository.create_chat_interaction.return_value = TEST_CHAT_INTERACTION_ID
+
+    returned_interaction = await chat_service.chat(TEST_PROMPT, TEST_USER_ID, template=template)
+
+    mock_llm_client.generate_text.assert_called_once_with(TEST_PROMPT, None, template)
+    assert returned_interaction.prompt == TEST_PROMPT
+    assert returned_interaction.templateId == "support"
+
+@pytest.mark.asyncio
+async def test_chat_stream_success(chat_service, mock_llm_client, mock_chat_repository):
+    """
+    Test that chat_stream forwards each chunk to on_token and saves the full response.
+    """
+    async def stream_text(prompt, config=None, template=None):
+        for chunk in ["I am ", "doing well, ", "thank you!"]:
+            yield LLMResponse(text=chunk)
+
+    mock_llm_client.stream_text = stream_text
+    mock_chat_repository.create_chat_interaction.return_value = TEST_CHAT_INTERACTION_ID
+    received = []
+
+    async def on_token(text):
+        received.append(text)
+
+    returned_interaction = await chat_service.chat_stream(TEST_PROMPT, on_token, TEST_USER_ID)
+
+    assert received == ["I am ", "doing well, ", "thank you!"]
+    assert returned_interaction.id == TEST_CHAT_INTERACTION_ID
+    assert returned_interaction.response == TEST_LLM_RESPONSE
+    mock_chat_repository.create_chat_interaction.assert_called_once()
+
+@pytest.mark.asyncio
+async def test_chat_stream_llm_generation_error(chat_service, mock_llm_client, mock_chat_repository):
+    """
+    Test that chat_stream raises ChatProcessingError and saves nothing when the stream fails.
+    """
+    async def stream_text(prompt, config=None, template=None):
+        yield LLMResponse(text="I am ")
+        raise LLMGenerationError("LLM failed")
+
+    mock_llm_client.stream_text = stream_text
+
+    with pytest.raises(ChatProcessingError, match="Failed to generate response due to LLM error."):
+        await chat_service.chat_stream(TEST_PROMPT, AsyncMock(), TEST_USER_ID)
+
+    mock_chat_repository.create_chat_interaction.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_chat_cancelled_is_recorded(chat_service, mock_llm_client, mock_chat_repository):
+    """
+    Test that a cancelled chat is recorded with a cancelled status and counted as cancelled.
+    """
+    mock_llm_client.generate_text.side_effect = never_finishes
+
+    task = asyncio.create_task(chat_service.chat(TEST_PROMPT, TEST_USER_ID))
+    await asyncio.sleep(0.01)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    recorded_interaction = mock_chat_repository.create_chat_interaction.call_args[0][0]
+    assert recorded_interaction.status == "cancelled"
+    assert recorded_interaction.response == ""
+    assert chat_service.metrics.cancelled_count == 1
+
+@pytest.mark.asyncio
+async def test_chat_cancelled_is_discarded(mock_llm_client, mock_chat_repository):
+    """
+    Test that the discard policy does not record cancelled chats.
+    """
+    chat_service = ChatService(mock_llm_client, mock_chat_repository, cancellation_policy="discard")
+    mock_llm_client.generate_text.side_effect = never_finishes
+
+    task = asyncio.create_task(chat_service.chat(TEST_PROMPT, TEST_USER_ID))
+    await asyncio.sleep(0.01)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    mock_chat_repository.create_chat_interaction.assert_not_called()
+    assert chat_service.metrics.cancelled_count == 1
+
+@pytest.mark.asyncio
+async def test_chat_stream_cancelled_records_partial_response(chat_service, mock_llm_client, mock_chat_repository):
+    """
+    Test that a cancelled stream records the response generated so far.
+    """
+    async def stream_text(prompt, config=None, template=None):
+        yield LLMResponse(text="I am ")
+        await asyncio.sleep(60)
+        yield LLMResponse(text="never sent")
+
+    mock_llm_client.stream_text = stream_text
+
+    task = asyncio.create_task(chat_service.chat_stream(TEST_PROMPT, AsyncMock(), TEST_USER_ID))
+    await asyncio.sleep(0.01)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    recorded_interaction = mock_chat_repository.create_chat_interaction.call_args[0][0]
+    assert recorded_interaction.status == "cancelled"
+    assert recorded_interaction.response == "I am "
+
+@pytest.mark.asyncio
+async def test_chat_stream_consumer_error_is_cancellation(chat_service, mock_llm_client, mock_chat_repository):
+    """
+    Test that an exception raised by on_token stops the stream, is recorded as a cancellation
+    and reaches the caller unwrapped.
+    """
+    class ConsumerGone(Exception):
+        pass
+
+    async def stream_text(prompt, config=None, template=None):
+        yield LLMResponse(text="I am ")
+        yield LLMResponse(text="doing well")
+        yield LLMResponse(text="never sent")
+
+    async def on_token(text):
+        if text == "doing well":
+            raise ConsumerGone()
+
+    mock_llm_client.stream_text = stream_text
+
+    with pytest.raises(ConsumerGone):
+        await chat_service.chat_stream(TEST_PROMPT, on_token, TEST_USER_ID)
+
+    recorded_interaction = mock_chat_repository.create_chat_interaction.call_args[0][0]
+    assert recorded_interaction.status == "cancelled"
+    assert recorded_interaction.response == "I am doing well"
+    assert chat_service.metrics.cancelled_count == 1
+    assert chat_service.metrics.completed_count == 0
+
+@pytest.mark.asyncio
+async def test_chat_completed_updates_metrics(chat_service, mock_llm_client, mock_chat_repository):
+    """
+    Test that completed chats are counted in the generation metrics.
+    """
+    mock_llm_client.generate_text.return_value = LLMResponse(text=TEST_LLM_RESPONSE)
+    mock_chat_repository.create_chat_interaction.return_value = TEST_CHAT_INTERACTION_ID
+
+    returned_interaction = await chat_service.chat(TEST_PROMPT, TEST_USER_ID)
+
+    assert returned_interaction.status == "completed"
+    assert chat_service.metrics.completed_count == 1
+
+@pytest.mark.asyncio
+async def test_chat_preprocesses_prompt(mock_llm_client, mock_chat_repository):
+    """
+    Test that the preprocessed prompt is sent and its estimated token count recorded
+    next to the provider's actual count.
+    """
+    chat_service = ChatService(
+        mock_llm_client,
+        mock_chat_repository,
+        preprocessor=build_default_pipeline(soft_limit=100, hard_limit=200)
+    )
+    mock_llm_client.generate_text.return_value = LLMResponse(text=TEST_LLM_RESPONSE, promptTokens=7)
+    mock_chat_repository.create_chat_interaction.return_value = TEST_CHAT_INTERACTION_ID
+
+    returned_interaction = await chat_service.chat(f"  {TEST_PROMPT}   \n\n", TEST_USER_ID)
+
+    mock_llm_client.generate_text.assert_called_once_with(TEST_PROMPT, None, None)
+    assert returned_interaction.prompt == TEST_PROMPT
+    assert returned_interaction.estimatedTokens == TokenEstimator().estimate(TEST_PROMPT)
+    assert returned_interaction.promptTokens == 7
+
+@pytest.mark.asyncio
+async def test_chat_stream_records_final_prompt_tokens(chat_service, mock_llm_client, mock_chat_repository):
+    """
+    Test that a stream records the prompt token count of its last chunk reporting usage.
+    """
+    async def stream_text(prompt, config=None, template=None):
+        yield LLMResponse(text="I am ", promptTokens=5)
+        yield LLMResponse(text="doing well, thank you!", promptTokens=6)
+        yield LLMResponse(text="")
+
+    mock_llm_client.stream_text = stream_text
+    on_token = AsyncMock()
+
+    returned_interaction = await chat_service.chat_stream(TEST_PROMPT, on_token, TEST_USER_ID)
+
+    assert returned_interaction.response == TEST_LLM_RESPONSE
+    assert returned_interaction.promptTokens == 6
+    assert on_token.await_count == 2
+
+@pytest.mark.asyncio
+async def test_chat_rejects_oversized_prompt(mock_llm_client, mock_chat_repository):
+    """
+    Test that a prompt over the hard limit is rejected before the LLM is called.
+    """
+    chat_service = ChatService(
+        mock_llm_client,
+        mock_chat_repository,
+        preprocessor=build_default_pipeline(soft_limit=2, hard_limit=3)
+    )
+
+    with pytest.raises(PromptTooLargeError):
+        await chat_service.chat(TEST_PROMPT, TEST_USER_ID)
+
+    mock_llm_client.generate_text.assert_not_called()
+    mock_chat_repository.create_chat_interaction.assert_not_called()
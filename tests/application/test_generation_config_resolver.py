@@ -0,0 +1,94 @@
+import pytest
+
+from src.application.services.generation_config_resolver import (
+    GenerationConfigResolver,
+    InvalidGenerationConfigError,
+)
+from src.shared.settings import ModelTier
+
+@pytest.fixture
+def resolver():
+    """
+    Pytest fixture for a GenerationConfigResolver with two tiers.
+    """
+    return GenerationConfigResolver(
+        tiers={
+            "standard": ModelTier(models=["standard-model", "standard-model-alt"], max_output_tokens=8192),
+            "fast": ModelTier(
+                models=["fast-model"],
+                max_output_tokens=1024,
+                temperature=0.2,
+                max_temperature=1.0,
+                max_top_p=0.9,
+                max_top_k=40
+            ),
+        },
+        default_tier="standard"
+    )
+
+def test_resolve_default_tier(resolver):
+    """
+    Test that an empty request resolves to the default tier's config.
+    """
+    config = resolver.resolve()
+
+    assert config.tier == "standard"
+    assert config.model == "standard-model"
+    assert config.maxOutputTokens == 8192
+
+def test_resolve_reuses_tier_config(resolver):
+    """
+    Test that requests without overrides share the cached config object of their tier.
+    """
+    assert resolver.resolve(tier="fast") is resolver.resolve(tier="fast")
+
+def test_resolve_tier_from_model(resolver):
+    """
+    Test that a whitelisted model selects its tier when no tier is given.
+    """
+    config = resolver.resolve(model="fast-model")
+
+    assert config.tier == "fast"
+    assert config.temperature == 0.2
+
+def test_resolve_with_overrides(resolver):
+    """
+    Test that overrides within the tier limits are applied.
+    """
+    config = resolver.resolve(tier="standard", model="standard-model-alt", max_output_tokens=100, top_k=5)
+
+    assert config.model == "standard-model-alt"
+    assert config.maxOutputTokens == 100
+    assert config.topK == 5
+
+@pytest.mark.parametrize("kwargs, message", [
+    ({"tier": "unknown"}, "Unknown model tier"),
+    ({"model": "other-model"}, "not allowed in any tier"),
+    ({"tier": "fast", "model": "standard-model"}, "not allowed in tier"),
+    ({"tier": "fast", "max_output_tokens": 2048}, "must not exceed 1024"),
+    ({"tier": "fast", "temperature": 1.5}, "temperature must not exceed 1.0"),
+    ({"tier": "fast", "top_p": 0.95}, "topP must not exceed 0.9"),
+    ({"tier": "fast", "top_k": 64}, "topK must not exceed 40"),
+])
+def test_resolve_invalid(resolver, kwargs, message):
+    """
+    Test that parameters outside the whitelisted tiers are rejected.
+    """
+    with pytest.raises(InvalidGenerationConfigError, match=message):
+        resolver.resolve(**kwargs)
+
+def test_resolve_sampling_within_tier_bounds(resolver):
+    """
+    Test that sampling overrides at the tier bounds are accepted, and that tiers without a topK bound accept any topK.
+    """
+    config = resolver.resolve(tier="fast", temperature=1.0, top_p=0.9, top_k=40)
+
+    assert (config.temperature, config.topP, config.topK) == (1.0, 0.9, 40)
+    assert resolver.resolve(tier="standard", top_k=500).topK == 500
+
+def test_invalid_default_tier():
+    """
+    Test that the resolver refuses a default tier that is not configured.
+    """
+    with pytest.raises(ValueError):
+        GenerationConfigResolver(tiers={}, default_tier="standard")
@@ -0,0 +1,30 @@
+import pytest
+
+from src.application.services.generation_metrics import GenerationMetrics
+
+def test_cancelled_without_history_saves_nothing():
+    """
+    Test that no time is counted as saved before any generation has completed.
+    """
+    metrics = GenerationMetrics()
+
+    assert metrics.record_cancelled(1.5) == 0.0
+    assert metrics.snapshot()["wastedSeconds"] == 1.5
+    assert metrics.snapshot()["savedSeconds"] == 0.0
+
+def test_saved_time_uses_average_completed_duration():
+    """
+    Test that saved time is the average completed duration minus the elapsed time.
+    """
+    metrics = GenerationMetrics()
+    metrics.record_completed(2.0)
+    metrics.record_completed(4.0)
+
+    assert metrics.record_cancelled(1.0) == pytest.approx(2.0)
+    assert metrics.record_cancelled(5.0) == 0.0
+
+    snapshot = metrics.snapshot()
+    assert snapshot["completedCount"] == 2
+    assert snapshot["cancelledCount"] == 2
+    assert snapshot["wastedSeconds"] == pytest.approx(6.0)
+    assert snapshot["savedSeconds"] == pytest.approx(2.0)
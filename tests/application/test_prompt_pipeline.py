@@ -0,0 +1,177 @@
+import time
+import pytest
+
+from src.application.services.prompt_pipeline import (
+    DuplicateContentStage,
+    PromptContext,
+    PromptPipeline,
+    PromptStage,
+    PromptTooLargeError,
+    RawLengthGuardStage,
+    SizeGuardStage,
+    TokenEstimationStage,
+    TokenEstimator,
+    WhitespaceNormalizationStage,
+    build_default_pipeline,
+)
+from src.domain.entities.prompt_template import PromptTemplate
+
+REPEATED_PARAGRAPH = "Please summarize the following quarterly report for the board."
+
+def test_whitespace_normalization():
+    """
+    Test that trailing, repeated inline and blank-line whitespace is collapsed while indentation is kept.
+    """
+    context = PromptContext(prompt="  Hello   world  \r\n\r\n\r\n\r\n    indented\tline   \n")
+
+    WhitespaceNormalizationStage().process(context)
+
+    assert context.prompt == "Hello world\n\n    indented\tline"
+
+def test_whitespace_normalization_long_indentation_is_fast():
+    """
+    Test that a long run of indentation before text is normalized in linear time.
+    """
+    context = PromptContext(prompt="x\n" + " " * 400_000 + "y   \n")
+
+    started = time.monotonic()
+    WhitespaceNormalizationStage().process(context)
+
+    assert time.monotonic() - started < 0.5
+    assert context.prompt == "x\n" + " " * 400_000 + "y"
+
+def test_duplicate_content_removed():
+    """
+    Test that long repeated paragraphs are dropped and short ones are kept.
+    """
+    context = PromptContext(prompt=f"{REPEATED_PARAGRAPH}\n\nOK\n\n{REPEATED_PARAGRAPH}\n\nOK")
+
+    DuplicateContentStage().process(context)
+
+    assert context.prompt == f"{REPEATED_PARAGRAPH}\n\nOK\n\nOK"
+    assert context.warnings == ["Duplicate paragraphs removed from prompt."]
+
+def test_token_estimator():
+    """
+    Test that words count one token per four characters and punctuation one token each.
+    """
+    estimator = TokenEstimator()
+
+    assert estimator.estimate("") == 0
+    assert estimator.estimate("Hello, world!") == 6
+    assert estimator.estimate("internationalization") == 5
+
+def test_token_estimator_cache_is_bounded():
+    """
+    Test that estimates are cached and the least recently used entries are evicted.
+    """
+    estimator = TokenEstimator(cache_size=2)
+
+    estimator.estimate("first")
+    estimator.estimate("second")
+    estimator.estimate("first")
+    estimator.estimate("third")
+
+    assert len(estimator._cache) == 2
+    assert estimator.estimate("first") == 2
+
+def test_token_estimation_includes_template():
+    """
+    Test that the template prefix is counted in the estimate.
+    """
+    estimator = TokenEstimator()
+    template = PromptTemplate(id="support", content="You are a helpful support agent.")
+    context = PromptContext(prompt="Hello", template=template)
+
+    TokenEstimationStage(estimator).process(context)
+
+    assert context.estimatedTokens == estimator.estimate("Hello") + estimator.estimate(template.content)
+
+def test_size_guard_limits():
+    """
+    Test that the soft limit flags the prompt and the hard limit rejects it.
+    """
+    guard = SizeGuardStage(soft_limit=10, hard_limit=20)
+
+    within = PromptContext(prompt="", estimatedTokens=10)
+    guard.process(within)
+    assert within.warnings == []
+
+    soft = PromptContext(prompt="", estimatedTokens=15)
+    guard.process(soft)
+    assert soft.warnings == ["Prompt exceeds the soft token limit."]
+
+    with pytest.raises(PromptTooLargeError) as excinfo:
+        guard.process(PromptContext(prompt="", estimatedTokens=21))
+    assert excinfo.value.estimated_tokens == 21
+    assert excinfo.value.limit == 20
+
+def test_size_guard_without_hard_limit():
+    """
+    Test that without a hard limit large prompts are only flagged.
+    """
+    guard = SizeGuardStage(soft_limit=10)
+    context = PromptContext(prompt="", estimatedTokens=1_000_000)
+
+    guard.process(context)
+
+    assert context.warnings == ["Prompt exceeds the soft token limit."]
+
+def test_size_guard_invalid_limits():
+    """
+    Test that a soft limit above the hard limit is refused.
+    """
+    with pytest.raises(ValueError):
+        SizeGuardStage(soft_limit=30, hard_limit=20)
+
+def test_raw_length_guard():
+    """
+    Test that prompts far above the hard limit are rejected from their raw length alone.
+    """
+    guard = RawLengthGuardStage(hard_limit=10, characters_per_token=8)
+
+    guard.process(PromptContext(prompt=" " * 80))
+    with pytest.raises(PromptTooLargeError) as excinfo:
+        guard.process(PromptContext(prompt=" " * 81))
+    assert excinfo.value.limit == 10
+
+def test_default_pipeline_rejects_oversized_raw_prompt():
+    """
+    Test that the default pipeline rejects a huge whitespace-heavy prompt before normalizing it.
+    """
+    pipeline = build_default_pipeline(soft_limit=100, hard_limit=200)
+
+    with pytest.raises(PromptTooLargeError):
+        pipeline.run("x\n" + " " * 100_000 + "y")
+
+def test_default_pipeline():
+    """
+    Test that the default pipeline normalizes the prompt and stores its estimate.
+    """
+    pipeline = build_default_pipeline(soft_limit=100, hard_limit=200)
+
+    context = pipeline.run(f"{REPEATED_PARAGRAPH}   \n\n\n\n{REPEATED_PARAGRAPH}")
+
+    assert context.prompt == REPEATED_PARAGRAPH
+    assert context.estimatedTokens == TokenEstimator().estimate(REPEATED_PARAGRAPH)
+
+def test_default_pipeline_without_hard_limit():
+    """
+    Test that the default pipeline accepts large prompts when no hard limit is configured.
+    """
+    pipeline = build_default_pipeline(soft_limit=100)
+
+    context = pipeline.run("word " * 10_000)
+
+    assert context.estimatedTokens == 10_000
+    assert "Prompt exceeds the soft token limit." in context.warnings
+
+def test_custom_stage():
+    """
+    Test that custom stages can be plugged into the pipeline.
+    """
+    class UppercaseStage(PromptStage):
+        def process(self, context):
+            context.prompt = context.prompt.upper()
+
+    assert PromptPipeline(stages=[UppercaseStage()]).run("hello").prompt == "HELLO"
@@ -1,16 +1,35 @@
 # tests/unit/test_gemini_client.py
 
 import pytest
-from unittest.mock import MagicMock
-from src.infrastructure.clients.gemini_client import GeminiClient
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+from google.genai import errors
+from src.infrastructure.clients.gemini_client import GeminiClient, build_content_config
+from src.domain.entities.generation_config import GenerationConfig
+from src.domain.entities.llm_response import LLMResponse
+from src.domain.entities.prompt_template import PromptTemplate
 from src.domain.clients.llm_client import LLMGenerationError
 
 @pytest.fixture
 def mock_genai_client():
     """
     Fixture that provides a MagicMock representing a genai.Client instance.
+    The async API under `aio` is stubbed with AsyncMocks.
     """
-    return MagicMock()
+    mock_client = MagicMock()
+    mock_client.aio.models.generate_content = AsyncMock()
+    mock_client.aio.models.generate_content_stream = AsyncMock()
+    mock_client.aio.caches.create = AsyncMock()
+    mock_client.aio.caches.update = AsyncMock()
+    mock_client.aio.caches.delete = AsyncMock()
+    return mock_client
+
+def make_response(text, prompt_tokens=None):
+    """
+    Builds a stand-in for a GenerateContentResponse, with usage metadata when prompt_tokens is given.
+    """
+    usage_metadata = SimpleNamespace(prompt_token_count=prompt_tokens) if prompt_tokens is not None else None
+    return SimpleNamespace(text=text, usage_metadata=usage_metadata)
 
 @pytest.fixture
 def gemini_client(mock_genai_client):
@@ -36,49 +55,199 @@ def test_get_model_name(gemini_client):
     assert gemini_client.get_model_name() == "gemini-2.5-flash"
 
 
-def test_generate_text_success(gemini_client, mock_genai_client):
+@pytest.mark.asyncio
+async def test_generate_text_success(gemini_client, mock_genai_client):
     """
     Tests successful text generation by mocking the genai client's response.
     """
     # Arrange: Configure the mock client to return a successful response
-    mock_response_object = MagicMock()
-    mock_response_object.text = "This is a brilliantly generated response from Gemini!"
-    mock_genai_client.models.generate_content.return_value = mock_response_object
+    mock_response_object = make_response("This is a brilliantly generated response from Gemini!", prompt_tokens=12)
+    mock_genai_client.aio.models.generate_content.return_value = mock_response_object
 
     prompt = "Tell me a fun fact about unit testing."
     
     # Act: Call the method under test
-    response = gemini_client.generate_text(prompt)
+    response = await gemini_client.generate_text(prompt)
 
     # Assertions:
     # 1. Check if the response matches what the mock returned
-    assert response == "This is a brilliantly generated response from Gemini!"
+    assert response == LLMResponse(text="This is a brilliantly generated response from Gemini!", promptTokens=12)
     
     # 2. Verify that `generate_content` was called exactly once with the correct arguments
-    mock_genai_client.models.generate_content.assert_called_once_with(
+    mock_genai_client.aio.models.generate_content.assert_called_once_with(
         model="gemini-2.5-flash",
         contents=prompt,
+        config=None,
     )
 
 
-def test_generate_text_llm_generation_error(gemini_client, mock_genai_client):
+@pytest.mark.asyncio
+async def test_generate_text_llm_generation_error(gemini_client, mock_genai_client):
     """
     Tests error handling during text generation when the genai client raises an exception.
     """
     # Arrange: Configure the mock client to raise an exception
-    mock_genai_client.models.generate_content.side_effect = Exception("API connection failed")
+    mock_genai_client.aio.models.generate_content.side_effect = Exception("API connection failed")
 
     prompt = "Generate a poem about a lost sock."
 
     # Act & Assert: Expect LLMGenerationError to be raised
     with pytest.raises(LLMGenerationError) as excinfo:
-        gemini_client.generate_text(prompt)
+        await gemini_client.generate_text(prompt)
 
     # Verify the error message contains the original exception details
     assert "An unexpected error occurred during LLM response generation: API connection failed" in str(excinfo.value)
     
     # Verify that `generate_content` was still called
-    mock_genai_client.models.generate_content.assert_called_once_with(
+    mock_genai_client.aio.models.generate_content.assert_called_once_with(
         model="gemini-2.5-flash",
         contents=prompt,
-    )
\ No newline at end of file
+        config=None,
+    )
+
+
+@pytest.mark.asyncio
+async def test_generate_text_with_config(gemini_client, mock_genai_client):
+    """
+    Tests that the generation config selects the model and is passed to the SDK.
+    """
+    mock_genai_client.aio.models.generate_content.return_value = make_response("Fast answer")
+    config = GenerationConfig(tier="fast", model="gemini-2.5-flash-lite", maxOutputTokens=256, temperature=0.2)
+
+    response = await gemini_client.generate_text("Quick question", config)
+
+    assert response.text == "Fast answer"
+    assert response.promptTokens is None
+    call_kwargs = mock_genai_client.aio.models.generate_content.call_args.kwargs
+    assert call_kwargs["model"] == "gemini-2.5-flash-lite"
+    assert call_kwargs["config"].max_output_tokens == 256
+    assert call_kwargs["config"].temperature == 0.2
+
+
+def test_build_content_config_is_cached_per_config():
+    """
+    Tests that equal generation configs reuse the same SDK config object.
+    """
+    first = build_content_config(GenerationConfig(tier="standard", model="gemini-2.5-flash", maxOutputTokens=8192))
+    second = build_content_config(GenerationConfig(tier="standard", model="gemini-2.5-flash", maxOutputTokens=8192))
+
+    assert first is second
+
+
+
+@pytest.mark.asyncio
+async def test_generate_text_with_cached_template(gemini_client, mock_genai_client):
+    """
+    Tests that a template prefix is served from a context cache instead of being resent.
+    """
+    mock_genai_client.aio.caches.create.return_value = SimpleNamespace(name="cachedContents/abc")
+    mock_genai_client.aio.models.generate_content.return_value = make_response("Cached answer")
+    template = PromptTemplate(id="support", content="You are a helpful support agent.")
+
+    await gemini_client.generate_text("My order is late.", template=template)
+    await gemini_client.generate_text("Where is my refund?", template=template)
+
+    mock_genai_client.aio.caches.create.assert_called_once()
+    call_kwargs = mock_genai_client.aio.models.generate_content.call_args.kwargs
+    assert call_kwargs["contents"] == "Where is my refund?"
+    assert call_kwargs["config"].cached_content == "cachedContents/abc"
+
+
+@pytest.mark.asyncio
+async def test_generate_text_recreates_missing_cache(gemini_client, mock_genai_client):
+    """
+    Tests that a cache the provider no longer recognizes is dropped and recreated on the next request.
+    """
+    mock_genai_client.aio.caches.create.side_effect = [
+        SimpleNamespace(name="cachedContents/old"),
+        SimpleNamespace(name="cachedContents/new"),
+    ]
+    mock_genai_client.aio.models.generate_content.side_effect = [
+        errors.ClientError(403, {"error": {"code": 403, "message": "CachedContent not found (or permission denied)"}}),
+        make_response("Cached answer"),
+    ]
+    template = PromptTemplate(id="support", content="You are a helpful support agent.")
+
+    with pytest.raises(LLMGenerationError):
+        await gemini_client.generate_text("My order is late.", template=template)
+    await gemini_client.generate_text("My order is late.", template=template)
+
+    mock_genai_client.aio.caches.delete.assert_called_once_with(name="cachedContents/old")
+    assert mock_genai_client.aio.models.generate_content.call_args.kwargs["config"].cached_content == "cachedContents/new"
+
+
+@pytest.mark.asyncio
+async def test_generate_text_keeps_cache_on_unrelated_error(gemini_client, mock_genai_client):
+    """
+    Tests that failures unrelated to the cache do not discard a live, billed cache.
+    """
+    mock_genai_client.aio.caches.create.return_value = SimpleNamespace(name="cachedContents/abc")
+    mock_genai_client.aio.models.generate_content.side_effect = [
+        errors.ServerError(503, {"error": {"code": 503, "message": "The model is overloaded."}}),
+        make_response("Cached answer"),
+    ]
+    template = PromptTemplate(id="support", content="You are a helpful support agent.")
+
+    with pytest.raises(LLMGenerationError):
+        await gemini_client.generate_text("My order is late.", template=template)
+    await gemini_client.generate_text("My order is late.", template=template)
+
+    mock_genai_client.aio.caches.create.assert_called_once()
+    mock_genai_client.aio.caches.delete.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_generate_text_template_falls_back_to_system_instruction(gemini_client, mock_genai_client):
+    """
+    Tests that the template is sent inline as the system instruction when no context cache can be created,
+    matching where the cached path places it.
+    """
+    mock_genai_client.aio.caches.create.side_effect = Exception("Cached content is too small")
+    mock_genai_client.aio.models.generate_content.return_value = make_response("Plain answer")
+    template = PromptTemplate(id="support", content="You are a helpful support agent.")
+
+    await gemini_client.generate_text("My order is late.", template=template)
+
+    call_kwargs = mock_genai_client.aio.models.generate_content.call_args.kwargs
+    assert call_kwargs["contents"] == "My order is late."
+    assert call_kwargs["config"].system_instruction == template.content
+    assert call_kwargs["config"].cached_content is None
+
+
+@pytest.mark.asyncio
+async def test_stream_text(gemini_client, mock_genai_client):
+    """
+    Tests that streamed chunks are yielded as they arrive, skipping empty ones,
+    and that a trailing usage-only chunk is kept for its prompt token count.
+    """
+    async def chunks():
+        yield make_response("Once upon ")
+        yield make_response(None)
+        yield make_response("a time.", prompt_tokens=7)
+        yield make_response(None, prompt_tokens=8)
+
+    mock_genai_client.aio.models.generate_content_stream.return_value = chunks()
+
+    received = [chunk async for chunk in gemini_client.stream_text("Tell me a story.")]
+
+    assert received == [
+        LLMResponse(text="Once upon "),
+        LLMResponse(text="a time.", promptTokens=7),
+        LLMResponse(text="", promptTokens=8),
+    ]
+    mock_genai_client.aio.models.generate_content_stream.assert_called_once_with(
+        model="gemini-2.5-flash",
+        contents="Tell me a story.",
+        config=None,
+    )
+
+
+@pytest.mark.asyncio
+async def test_stream_text_llm_generation_error(gemini_client, mock_genai_client):
+    """
+    Tests that stream failures are raised as LLMGenerationError.
+    """
+    mock_genai_client.aio.models.generate_content_stream.side_effect = Exception("API connection failed")
+
+    with pytest.raises(LLMGenerationError):
+        [chunk async for chunk in gemini_client.stream_text("Tell me a story.")]
@@ -0,0 +1,196 @@
+import asyncio
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+from src.infrastructure.clients.gemini_context_cache import GeminiContextCache
+from src.domain.entities.prompt_template import PromptTemplate
+
+TEMPLATE = PromptTemplate(id="support", content="You are a helpful support agent.")
+MODEL = "gemini-2.5-flash"
+
+class FakeClock:
+    """
+    Controllable monotonic clock for cache lifetime tests.
+    """
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def mock_genai_client():
+    """
+    Fixture that provides a stubbed genai.Client whose caches API returns named caches.
+    """
+    client = MagicMock()
+    created = iter(["cachedContents/1", "cachedContents/2", "cachedContents/3"])
+    client.aio.caches.create = AsyncMock(side_effect=lambda **kwargs: SimpleNamespace(name=next(created)))
+    client.aio.caches.update = AsyncMock()
+    client.aio.caches.delete = AsyncMock()
+    return client
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+@pytest.fixture
+def context_cache(mock_genai_client, clock):
+    return GeminiContextCache(mock_genai_client, ttl_seconds=600, refresh_margin_seconds=60, clock=clock)
+
+
+@pytest.mark.asyncio
+async def test_creates_cache_once(context_cache, mock_genai_client):
+    """
+    Tests that repeated lookups reuse the same cache while it is fresh.
+    """
+    assert await context_cache.get_cache_name(TEMPLATE, MODEL) == "cachedContents/1"
+    assert await context_cache.get_cache_name(TEMPLATE, MODEL) == "cachedContents/1"
+
+    mock_genai_client.aio.caches.create.assert_called_once()
+    config = mock_genai_client.aio.caches.create.call_args.kwargs["config"]
+    assert config.system_instruction == TEMPLATE.content
+    assert config.ttl == "600s"
+
+
+@pytest.mark.asyncio
+async def test_refreshes_cache_near_expiry(context_cache, mock_genai_client, clock):
+    """
+    Tests that a cache within the refresh margin has its TTL extended instead of being recreated.
+    """
+    await context_cache.get_cache_name(TEMPLATE, MODEL)
+    clock.now = 570
+
+    assert await context_cache.get_cache_name(TEMPLATE, MODEL) == "cachedContents/1"
+    mock_genai_client.aio.caches.update.assert_called_once()
+    assert mock_genai_client.aio.caches.update.call_args.kwargs["name"] == "cachedContents/1"
+
+    clock.now = 1100
+    assert await context_cache.get_cache_name(TEMPLATE, MODEL) == "cachedContents/1"
+    mock_genai_client.aio.caches.create.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_recreates_expired_cache(context_cache, mock_genai_client, clock):
+    """
+    Tests that an expired cache is recreated rather than refreshed.
+    """
+    await context_cache.get_cache_name(TEMPLATE, MODEL)
+    clock.now = 700
+
+    assert await context_cache.get_cache_name(TEMPLATE, MODEL) == "cachedContents/2"
+    mock_genai_client.aio.caches.update.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_recreates_cache_when_refresh_fails(context_cache, mock_genai_client, clock):
+    """
+    Tests that a cache that cannot be refreshed is recreated.
+    """
+    mock_genai_client.aio.caches.update.side_effect = Exception("Not found")
+    await context_cache.get_cache_name(TEMPLATE, MODEL)
+    clock.now = 570
+
+    assert await context_cache.get_cache_name(TEMPLATE, MODEL) == "cachedContents/2"
+
+
+@pytest.mark.asyncio
+async def test_remembers_creation_failure(context_cache, mock_genai_client, clock):
+    """
+    Tests that a failed creation falls back to sending the template inline without retrying on every request.
+    """
+    mock_genai_client.aio.caches.create.side_effect = Exception("Cached content is too small")
+
+    assert await context_cache.get_cache_name(TEMPLATE, MODEL) is None
+    assert await context_cache.get_cache_name(TEMPLATE, MODEL) is None
+    mock_genai_client.aio.caches.create.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_separate_cache_per_model_and_content(context_cache, mock_genai_client):
+    """
+    Tests that caches are keyed by model and template content.
+    """
+    changed_template = PromptTemplate(id="support", content="You are a terse support agent.")
+
+    assert await context_cache.get_cache_name(TEMPLATE, MODEL) == "cachedContents/1"
+    assert await context_cache.get_cache_name(TEMPLATE, "gemini-2.5-flash-lite") == "cachedContents/2"
+    assert await context_cache.get_cache_name(changed_template, MODEL) == "cachedContents/3"
+
+
+@pytest.mark.asyncio
+async def test_invalidate(context_cache, mock_genai_client):
+    """
+    Tests that an invalidated cache is deleted upstream and recreated on the next lookup.
+    """
+    await context_cache.get_cache_name(TEMPLATE, MODEL)
+    await context_cache.invalidate(TEMPLATE, MODEL, "cachedContents/1")
+
+    mock_genai_client.aio.caches.delete.assert_called_once_with(name="cachedContents/1")
+    assert await context_cache.get_cache_name(TEMPLATE, MODEL) == "cachedContents/2"
+
+
+@pytest.mark.asyncio
+async def test_invalidate_forgets_cache_when_delete_fails(context_cache, mock_genai_client):
+    """
+    Tests that a cache already gone upstream is still forgotten locally.
+    """
+    mock_genai_client.aio.caches.delete.side_effect = Exception("Not found")
+    await context_cache.get_cache_name(TEMPLATE, MODEL)
+    await context_cache.invalidate(TEMPLATE, MODEL, "cachedContents/1")
+
+    assert await context_cache.get_cache_name(TEMPLATE, MODEL) == "cachedContents/2"
+
+
+@pytest.mark.asyncio
+async def test_invalidate_ignores_replaced_cache(context_cache, mock_genai_client):
+    """
+    Tests that invalidating a stale name does not drop the cache that replaced it.
+    """
+    await context_cache.get_cache_name(TEMPLATE, MODEL)
+    await context_cache.invalidate(TEMPLATE, MODEL, "cachedContents/old")
+
+    mock_genai_client.aio.caches.delete.assert_not_called()
+    assert await context_cache.get_cache_name(TEMPLATE, MODEL) == "cachedContents/1"
+
+
+@pytest.mark.asyncio
+async def test_concurrent_lookups_create_cache_once(context_cache, mock_genai_client):
+    """
+    Tests that concurrent lookups for the same template wait for a single creation.
+    """
+    release = asyncio.Event()
+
+    async def slow_create(**kwargs):
+        await release.wait()
+        return SimpleNamespace(name="cachedContents/1")
+
+    mock_genai_client.aio.caches.create.side_effect = slow_create
+    lookups = [asyncio.create_task(context_cache.get_cache_name(TEMPLATE, MODEL)) for _ in range(3)]
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await asyncio.gather(*lookups) == ["cachedContents/1"] * 3
+    mock_genai_client.aio.caches.create.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_slow_creation_does_not_block_other_keys(context_cache, mock_genai_client):
+    """
+    Tests that a pending creation for one template does not hold back fresh entries or other templates.
+    """
+    other_template = PromptTemplate(id="sales", content="You are a sales assistant.")
+    release = asyncio.Event()
+    await context_cache.get_cache_name(TEMPLATE, MODEL)
+
+    async def slow_create(**kwargs):
+        await release.wait()
+        return SimpleNamespace(name="cachedContents/slow")
+
+    mock_genai_client.aio.caches.create.side_effect = slow_create
+    pending = asyncio.create_task(context_cache.get_cache_name(other_template, MODEL))
+    await asyncio.sleep(0)
+
+    assert await asyncio.wait_for(context_cache.get_cache_name(TEMPLATE, MODEL), timeout=1) == "cachedContents/1"
+    release.set()
+    assert await pending == "cachedContents/slow"
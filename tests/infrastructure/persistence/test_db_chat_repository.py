@@ -1,10 +1,13 @@
+import asyncio
 import pytest
 from unittest.mock import MagicMock, AsyncMock
+from bson import ObjectId
 from pymongo.errors import PyMongoError
 from pymongo.database import Database
 from src.infrastructure.persistence.db_chat_repository import DatabaseChatRepository
 from src.domain.entities.chat_interaction import ChatInteraction
-from src.domain.repositories.chat_repository import ChatSaveError
+from src.domain.repositories.chat_repository import ChatRetrievalError, ChatSaveError
+from src.infrastructure.persistence.blob_store import ContentBlobStore
 
 
 @pytest.fixture
@@ -83,4 +86,203 @@ async def test_create_chat_interaction_pymongo_error(chat_repository, mock_colle
 
     # Assertions
     mock_collection.insert_one.assert_called_once()
-    assert "Failed to save chat interaction to database: Connection lost" in str(excinfo.value)
\ No newline at end of file
+    assert "Failed to save chat interaction to database: Connection lost" in str(excinfo.value)
+
+@pytest.fixture
+def mock_blob_collection():
+    """
+    Fixture to provide a mocked MongoDB collection for the content-addressed blobs.
+    """
+    mock_coll = MagicMock()
+    mock_coll.bulk_write = AsyncMock()
+    return mock_coll
+
+@pytest.fixture
+def dedup_database(mock_collection, mock_blob_collection):
+    """
+    Fixture to provide a mocked database that routes each collection name to its own mock.
+    """
+    collections = {"chat_interactions": mock_collection, "chat_blobs": mock_blob_collection}
+    mock_db = MagicMock(spec=Database)
+    mock_db.__getitem__.side_effect = lambda name: collections[name]
+    return mock_db
+
+@pytest.mark.asyncio
+async def test_create_chat_interaction_deduplicated(dedup_database, mock_collection, mock_blob_collection, sample_chat_interaction):
+    """
+    Tests that deduplicated mode stores bodies as blobs and only hash references in the interaction.
+    """
+    repository = DatabaseChatRepository(dedup_database, deduplicate=True)
+    mock_collection.insert_one.return_value = MagicMock(inserted_id="653b6e8a1a2b3c4d5e6f7a8b")
+
+    result_id = await repository.create_chat_interaction(sample_chat_interaction)
+
+    assert result_id == "653b6e8a1a2b3c4d5e6f7a8b"
+    operations = mock_blob_collection.bulk_write.call_args[0][0]
+    assert len(operations) == 2
+    assert all(operation._doc["$inc"] == {"refCount": 1} for operation in operations)
+
+    stored_document = mock_collection.insert_one.call_args[0][0]
+    assert "prompt" not in stored_document
+    assert "response" not in stored_document
+    assert stored_document["promptHash"] == ContentBlobStore.content_hash("Hello, bot!")
+    assert stored_document["responseHash"] == ContentBlobStore.content_hash("Hi there!")
+
+@pytest.mark.asyncio
+async def test_create_chat_interaction_deduplicated_same_body(dedup_database, mock_collection, mock_blob_collection):
+    """
+    Tests that a prompt identical to its response is written once with a reference count of two.
+    """
+    repository = DatabaseChatRepository(dedup_database, deduplicate=True)
+    mock_collection.insert_one.return_value = MagicMock(inserted_id="653b6e8a1a2b3c4d5e6f7a8b")
+    interaction = ChatInteraction(
+        model="test-model", userId="user123", prompt="echo", response="echo", timestamp="2023-10-27T10:00:00Z"
+    )
+
+    await repository.create_chat_interaction(interaction)
+
+    operations = mock_blob_collection.bulk_write.call_args[0][0]
+    assert len(operations) == 1
+    assert operations[0]._doc["$inc"] == {"refCount": 2}
+
+@pytest.mark.asyncio
+async def test_blob_store_acquire_accepts_generator(dedup_database, mock_blob_collection):
+    """
+    Tests that acquire counts references correctly when given a single-pass iterable.
+    """
+    blob_store = ContentBlobStore(dedup_database)
+
+    hashes = await blob_store.acquire(text for text in ["a", "b", "a"])
+
+    assert hashes == {"a": ContentBlobStore.content_hash("a"), "b": ContentBlobStore.content_hash("b")}
+    operations = mock_blob_collection.bulk_write.call_args[0][0]
+    assert sorted(operation._doc["$inc"]["refCount"] for operation in operations) == [1, 2]
+
+@pytest.mark.asyncio
+async def test_blob_store_empty_input(dedup_database, mock_blob_collection):
+    """
+    Tests that acquiring or releasing nothing does not issue an empty bulk write.
+    """
+    blob_store = ContentBlobStore(dedup_database)
+
+    assert await blob_store.acquire([]) == {}
+    await blob_store.release(iter([]))
+
+    mock_blob_collection.bulk_write.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_create_chat_interaction_deduplicated_releases_on_error(dedup_database, mock_collection, mock_blob_collection, sample_chat_interaction):
+    """
+    Tests that blob references are released when the interaction insert fails.
+    """
+    repository = DatabaseChatRepository(dedup_database, deduplicate=True)
+    mock_collection.insert_one.side_effect = PyMongoError("Connection lost")
+
+    with pytest.raises(ChatSaveError):
+        await repository.create_chat_interaction(sample_chat_interaction)
+
+    assert mock_blob_collection.bulk_write.call_count == 2
+    release_operations = mock_blob_collection.bulk_write.call_args[0][0]
+    assert all(operation._doc["$inc"] == {"refCount": -1} for operation in release_operations)
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("compression", [None, "zstd"])
+async def test_get_chat_interaction_deduplicated(dedup_database, mock_collection, mock_blob_collection, compression):
+    """
+    Tests that the read path resolves hash references back into prompt and response bodies.
+    """
+    if compression == "zstd":
+        pytest.importorskip("zstandard")
+    repository = DatabaseChatRepository(dedup_database, deduplicate=True, compression=compression)
+    blob_store = repository.blob_store
+    prompt_hash = ContentBlobStore.content_hash("Hello, bot!")
+    response_hash = ContentBlobStore.content_hash("Hi there!")
+    object_id = ObjectId()
+
+    mock_collection.find_one = AsyncMock(return_value={
+        "_id": object_id,
+        "userId": "user123",
+        "model": "test-model",
+        "timestamp": "2023-10-27T10:00:00Z",
+        "promptHash": prompt_hash,
+        "responseHash": response_hash,
+    })
+    cursor = MagicMock()
+    cursor.to_list = AsyncMock(return_value=[
+        {"_id": prompt_hash, **blob_store._encode("Hello, bot!")},
+        {"_id": response_hash, **blob_store._encode("Hi there!")},
+    ])
+    mock_blob_collection.find.return_value = cursor
+
+    interaction = await repository.get_chat_interaction(str(object_id))
+
+    assert interaction.id == str(object_id)
+    assert interaction.prompt == "Hello, bot!"
+    assert interaction.response == "Hi there!"
+
+@pytest.mark.asyncio
+async def test_create_chat_interaction_deduplicated_releases_on_cancel(dedup_database, mock_collection, mock_blob_collection, sample_chat_interaction):
+    """
+    Tests that blob references are released when the save is cancelled before the insert completes.
+    """
+    repository = DatabaseChatRepository(dedup_database, deduplicate=True)
+
+    async def never_finishes(document):
+        await asyncio.sleep(60)
+
+    mock_collection.insert_one.side_effect = never_finishes
+
+    task = asyncio.create_task(repository.create_chat_interaction(sample_chat_interaction))
+    await asyncio.sleep(0.01)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert mock_blob_collection.bulk_write.call_count == 2
+    release_operations = mock_blob_collection.bulk_write.call_args[0][0]
+    assert all(operation._doc["$inc"] == {"refCount": -1} for operation in release_operations)
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("document, blobs", [
+    ({"userId": "user123", "prompt": "Hi"}, []),
+    ({"userId": "user123", "model": "m", "timestamp": "2023-10-27T10:00:00Z", "promptHash": "p", "responseHash": "r"},
+     [{"_id": "p", "data": b"not zstd", "compression": "zstd"}, {"_id": "r", "data": "Hi there!"}]),
+])
+async def test_get_chat_interaction_malformed(dedup_database, mock_collection, mock_blob_collection, document, blobs):
+    """
+    Tests that malformed documents and undecodable blobs are reported as ChatRetrievalError.
+    """
+    if blobs:
+        pytest.importorskip("zstandard")
+    repository = DatabaseChatRepository(dedup_database, deduplicate=True)
+    mock_collection.find_one = AsyncMock(return_value={"_id": ObjectId(), **document})
+    cursor = MagicMock()
+    cursor.to_list = AsyncMock(return_value=blobs)
+    mock_blob_collection.find.return_value = cursor
+
+    with pytest.raises(ChatRetrievalError):
+        await repository.get_chat_interaction(str(ObjectId()))
+
+@pytest.mark.asyncio
+async def test_get_chat_interaction_inline(chat_repository, mock_collection, sample_chat_interaction):
+    """
+    Tests that the read path returns inline interactions unchanged.
+    """
+    object_id = ObjectId()
+    document = sample_chat_interaction.model_dump(exclude_none=True)
+    mock_collection.find_one = AsyncMock(return_value={"_id": object_id, **document})
+
+    interaction = await chat_repository.get_chat_interaction(str(object_id))
+
+    assert interaction.id == str(object_id)
+    assert interaction.prompt == sample_chat_interaction.prompt
+
+@pytest.mark.asyncio
+async def test_get_chat_interaction_not_found(chat_repository, mock_collection):
+    """
+    Tests that unknown or malformed IDs return None.
+    """
+    mock_collection.find_one = AsyncMock(return_value=None)
+
+    assert await chat_repository.get_chat_interaction(str(ObjectId())) is None
+    assert await chat_repository.get_chat_interaction("not-an-object-id") is None